@@ -10,8 +10,10 @@ from typing import Any, Optional
 from sqlalchemy.orm import Session
 from openai import OpenAI
 
+from catalog_cache import catalog_cache
 from config import get_settings
 from models import User, WorkerProfile, TutorProfile, HOME_SERVICE_TYPES, TUTOR_SUBJECTS
+from provider_search import search_page
 
 settings = get_settings()
 _client: Optional[OpenAI] = None
@@ -49,74 +51,106 @@ If no providers are found for a category, apologize and suggest trying again lat
 Always respond in a friendly, helpful, concise way. When recommending, briefly introduce the list then rely on the structured data shown to the user."""
 
 
-def get_providers_by_service(db: Session, service_type: str, limit: int = 3, prefer_rating: bool = False) -> list[dict]:
+def get_providers_by_service(
+    db: Session,
+    service_type: str,
+    limit: int = 3,
+    prefer_rating: bool = False,
+    location: Optional[tuple[float, float]] = None,
+) -> list[dict]:
     """
     Query approved providers by service_type (home service) or subject (tutor).
-    Returns list of dicts: name, service_type, rating, trust_score, price, distance (mocked).
+    With a customer location, returns the nearest providers; otherwise the best ranked.
+    Returns list of dicts: name, service_type, rating, trust_score, price, distance (km, None without location).
     """
     service_type = (service_type or "").strip().lower().replace(" ", "_")
+    if service_type not in HOME_SERVICE_TYPES and service_type not in TUTOR_SUBJECTS:
+        return []
+    if location is not None:
+        results, _ = search_page(
+            db,
+            [service_type] if service_type in HOME_SERVICE_TYPES else [],
+            [service_type] if service_type in TUTOR_SUBJECTS else [],
+            sort="distance", limit=limit, location=location,
+        )
+        return [_provider_dict(r) for r in results]
+    providers = catalog_cache.get_or_load(
+        service_type,
+        ("recommend", limit, prefer_rating),
+        lambda: _query_providers(db, service_type, limit, prefer_rating),
+    )
+    return [{**p, "distance": None} for p in providers]
+
+
+def _provider_dict(r: dict) -> dict:
+    return {
+        "id": r["id"],
+        "name": r["name"],
+        "service_type": r["service_type"] or r["subject"],
+        "rating": round(float(r["rating"] or 0), 1),
+        "trust_score": round(float(r["trust_score"] or 0), 1),
+        "price": float(r["price"]) if r["price"] is not None else round(random.uniform(200, 1500), 0),
+        "distance": r["distance"],
+    }
+
+
+def _query_providers(db: Session, service_type: str, limit: int, prefer_rating: bool) -> list[dict]:
     results = []
-
     if service_type in HOME_SERVICE_TYPES:
         q = (
-            db.query(User, WorkerProfile)
+            db.query(User.id, User.name, User.trust_score, WorkerProfile.service_type, WorkerProfile.rating, WorkerProfile.hourly_rate)
             .join(WorkerProfile, User.id == WorkerProfile.user_id)
             .filter(
                 WorkerProfile.service_type == service_type,
                 WorkerProfile.verification_status == "approved",
             )
         )
+        # Both orders are index range reads on (service_type, verification_status, key, user_id).
         if prefer_rating:
-            q = q.order_by(WorkerProfile.rating.desc(), User.trust_score.desc())
+            q = q.order_by(WorkerProfile.rating.desc(), WorkerProfile.user_id.desc())
         else:
-            q = q.order_by(User.trust_score.desc(), WorkerProfile.rating.desc())
+            q = q.order_by(WorkerProfile.rank_score.desc(), WorkerProfile.user_id.desc())
         rows = q.limit(limit).all()
-        for user, profile in rows:
-            price = profile.hourly_rate if profile.hourly_rate is not None else round(random.uniform(200, 1500), 0)
-            rating = (profile.rating if profile.rating is not None else 0) or 0
-            trust = (user.trust_score if user.trust_score is not None else 0) or 0
+        for row in rows:
+            price = row.hourly_rate if row.hourly_rate is not None else round(random.uniform(200, 1500), 0)
+            rating = (row.rating if row.rating is not None else 0) or 0
+            trust = (row.trust_score if row.trust_score is not None else 0) or 0
             results.append({
-                "id": user.id,
-                "name": user.name,
-                "service_type": profile.service_type,
+                "id": row.id,
+                "name": row.name,
+                "service_type": row.service_type,
                 "rating": round(float(rating), 1),
                 "trust_score": round(float(trust), 1),
                 "price": float(price),
-                "distance": round(random.uniform(1.0, 12.0), 1),
             })
     elif service_type in TUTOR_SUBJECTS:
         q = (
-            db.query(User, TutorProfile)
+            db.query(
+                User.id, User.name, User.trust_score, TutorProfile.subject, TutorProfile.rating, TutorProfile.hourly_rate,
+            )
             .join(TutorProfile, User.id == TutorProfile.user_id)
             .filter(
                 TutorProfile.subject == service_type,
                 TutorProfile.verification_status == "approved",
             )
         )
-        # Tutor "rating" from (qualification_score + skill_score) / 40 -> roughly 3.5-5
+        # Both orders are index range reads on (subject, verification_status, key, user_id).
         if prefer_rating:
-            q = q.order_by(
-                (TutorProfile.qualification_score + TutorProfile.skill_score).desc(),
-                User.trust_score.desc(),
-            )
+            q = q.order_by(TutorProfile.rating.desc(), TutorProfile.user_id.desc())
         else:
-            q = q.order_by(User.trust_score.desc())
+            q = q.order_by(TutorProfile.rank_score.desc(), TutorProfile.user_id.desc())
         rows = q.limit(limit).all()
-        for user, profile in rows:
-            qs = profile.qualification_score or 70
-            ss = profile.skill_score or 70
-            rating = round((qs + ss) / 40.0, 1)
-            rating = max(3.5, min(5.0, rating))
-            price = profile.hourly_rate if profile.hourly_rate is not None else round(random.uniform(300, 2000), 0)
-            trust = (user.trust_score if user.trust_score is not None else 0) or 0
+        for row in rows:
+            price = row.hourly_rate if row.hourly_rate is not None else round(random.uniform(300, 2000), 0)
+            rating = (row.rating if row.rating is not None else 0) or 0
+            trust = (row.trust_score if row.trust_score is not None else 0) or 0
             results.append({
-                "id": user.id,
-                "name": user.name,
-                "service_type": profile.subject,
-                "rating": rating,
+                "id": row.id,
+                "name": row.name,
+                "service_type": row.subject,
+                "rating": round(float(rating), 1),
                 "trust_score": round(float(trust), 1),
                 "price": float(price),
-                "distance": round(random.uniform(1.0, 12.0), 1),
             })
     return results
 
@@ -126,6 +160,7 @@ def chat_turn(
     message: str,
     conversation_history: list[dict],
     is_urgent: bool = False,
+    location: Optional[tuple[float, float]] = None,
 ) -> dict:
     """
     Process one user message and return { "reply": str, "recommended_providers": list or None }.
@@ -193,7 +228,9 @@ def chat_turn(
             try:
                 args = json.loads(tc.function.arguments) if isinstance(tc.function.arguments, str) else tc.function.arguments
                 st = args.get("service_type", "")
-                recommended_providers = get_providers_by_service(db, st, limit=3, prefer_rating=is_urgent)
+                recommended_providers = get_providers_by_service(
+                    db, st, limit=3, prefer_rating=is_urgent, location=location,
+                )
                 result = json.dumps({"providers": recommended_providers, "count": len(recommended_providers)})
             except Exception as e:
                 result = json.dumps({"error": str(e), "providers": []})
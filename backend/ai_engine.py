@@ -5,6 +5,7 @@ All AI logic runs from backend using OpenAI API.
 import json
 import os
 from typing import Optional
+import numpy as np
 from config import get_settings
 
 settings = get_settings()
@@ -165,3 +166,80 @@ def compute_trust_score(
     rating_score = ((avg_rating - 1) / 4) * 35.0 if avg_rating else 0  # 1-5 -> 0-35
     score = base + completion_bonus - cancellation_penalty + rating_score
     return max(0.0, min(100.0, round(score, 1)))
+
+
+def compute_trust_scores(
+    ai_approved: np.ndarray,
+    completion_rate: np.ndarray,
+    cancellation_rate: np.ndarray,
+    avg_rating: np.ndarray,
+) -> np.ndarray:
+    """
+    Vectorized compute_trust_score over arrays of providers; returns exactly the same values.
+    Same operation order as the scalar version so every intermediate double matches.
+    """
+    base = np.where(np.asarray(ai_approved, dtype=bool), 40.0, 0.0)
+    completion_bonus = np.asarray(completion_rate, dtype=np.float64) * 25.0
+    cancellation_penalty = np.asarray(cancellation_rate, dtype=np.float64) * 20.0
+    avg_rating = np.asarray(avg_rating, dtype=np.float64)
+    rating_score = np.where(avg_rating != 0, ((avg_rating - 1) / 4) * 35.0, 0.0)
+    score = base + completion_bonus - cancellation_penalty + rating_score
+    return np.clip(_round1(score), 0.0, 100.0) + 0.0  # + 0.0 turns -0.0 into 0.0 like max() does
+
+
+def _round1(values: np.ndarray) -> np.ndarray:
+    """round(x, 1) elementwise, matching Python's correctly rounded result."""
+    rounded = np.round(values, 1)
+    # np.round scales by 10 before rounding; only values within float error of a .x5 tie can
+    # land on the other side, so recheck those with Python's round.
+    scaled = values * 10.0
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), 1)
+    return rounded
+
+
+def compute_rank_score(trust_score: Optional[float], rating: Optional[float], price: Optional[float]) -> float:
+    """
+    Compute provider ranking score (0-100) from:
+    - Trust score (0-100)
+    - Rating (0-5)
+    - Price (lower is better; unpriced providers get no price credit)
+    Weights come from settings (rank_weight_*).
+    """
+    trust_part = (trust_score or 0.0) / 100.0
+    rating_part = (rating or 0.0) / 5.0
+    price_part = 0.0
+    if price is not None and price >= 0:
+        price_part = settings.rank_price_reference / (settings.rank_price_reference + price)
+    score = (
+        settings.rank_weight_trust * trust_part
+        + settings.rank_weight_rating * rating_part
+        + settings.rank_weight_price * price_part
+    ) * 100.0
+    return round(score, 4)
+
+
+def compute_rank_scores(trust_score: np.ndarray, rating: np.ndarray, price: np.ndarray) -> np.ndarray:
+    """Vectorized compute_rank_score; NaN price means unpriced."""
+    price = np.asarray(price, dtype=np.float64)
+    priced = ~np.isnan(price) & (price >= 0)
+    reference = settings.rank_price_reference
+    price_part = np.where(priced, reference / (reference + np.where(priced, price, 0.0)), 0.0)
+    score = (
+        settings.rank_weight_trust * (np.nan_to_num(np.asarray(trust_score, dtype=np.float64)) / 100.0)
+        + settings.rank_weight_rating * (np.nan_to_num(np.asarray(rating, dtype=np.float64)) / 5.0)
+        + settings.rank_weight_price * price_part
+    ) * 100.0
+    return np.round(score, 4)
+
+
+def profile_rating(profile) -> float:
+    """Customer rating (0-5) of a WorkerProfile or TutorProfile."""
+    return profile.rating or 0.0
+
+
+def refresh_rank_score(profile, trust_score: Optional[float]) -> None:
+    """Recompute a profile's persisted rank_score (and its copy of the owner's trust_score) after its trust, rating or price changed."""
+    profile.trust_score = trust_score or 0.0
+    profile.rank_score = compute_rank_score(trust_score, profile_rating(profile), profile.hourly_rate)
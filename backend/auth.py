@@ -1,19 +1,81 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Union
 import bcrypt
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from database import get_db
 from models import User
 from config import get_settings
+from hashing_pool import hashing_pool
+from principal_cache import principal_cache
+from token_versions import token_versions
 
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+ACCESS_TOKEN_EXPIRE_MINUTES = get_settings().access_token_expire_minutes  # default 24 hours
 BCRYPT_MAX_PASSWORD_BYTES = 72  # bcrypt limit
+BCRYPT_DEFAULT_ROUNDS = 12  # bcrypt.gensalt() default, used until calibrate_bcrypt_rounds() runs
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+BCRYPT_VALID_ROUNDS = (4, 31)  # what bcrypt.gensalt() accepts
+BCRYPT_PROBE_ROUNDS = 8
 
+logger = logging.getLogger(__name__)
 bearer_scheme = HTTPBearer(auto_error=False)
+_bcrypt_rounds = BCRYPT_DEFAULT_ROUNDS
+
+
+def calibrate_bcrypt_rounds() -> int:
+    """
+    Set the bcrypt cost for new hashes: settings.bcrypt_rounds as configured if set (a value
+    bcrypt rejects raises ValueError), otherwise the cost whose hash takes closest to
+    settings.bcrypt_target_ms on this machine, within [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS].
+    Each extra round doubles the time, so one cheap probe hash is enough to extrapolate.
+    Returns the cost chosen.
+    """
+    global _bcrypt_rounds
+    settings = get_settings()
+    if settings.bcrypt_rounds:
+        rounds = settings.bcrypt_rounds
+        if not BCRYPT_VALID_ROUNDS[0] <= rounds <= BCRYPT_VALID_ROUNDS[1]:
+            raise ValueError(f"BCRYPT_ROUNDS must be between {BCRYPT_VALID_ROUNDS[0]} and {BCRYPT_VALID_ROUNDS[1]}, got {rounds}")
+        if not BCRYPT_MIN_ROUNDS <= rounds <= BCRYPT_MAX_ROUNDS:
+            logger.warning(
+                "BCRYPT_ROUNDS=%d is outside the calibrated range %d-%d; using it as configured",
+                rounds, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS,
+            )
+        _bcrypt_rounds = rounds
+    else:
+        salt = bcrypt.gensalt(rounds=BCRYPT_PROBE_ROUNDS)
+        probe_ms = min(_time_hash(salt) for _ in range(3))
+        rounds = BCRYPT_PROBE_ROUNDS + round(math.log2(settings.bcrypt_target_ms / max(probe_ms, 1e-3)))
+        _bcrypt_rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+    logger.info("bcrypt cost set to %d rounds", _bcrypt_rounds)
+    return _bcrypt_rounds
+
+
+def _time_hash(salt: bytes) -> float:
+    started = time.perf_counter()
+    bcrypt.hashpw(b"calibration", salt)
+    return (time.perf_counter() - started) * 1000.0
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    True if hashed_password was made with a lower cost than new hashes use. Never downgrades:
+    nodes of different speeds calibrate to different costs, and logins bouncing between them
+    would otherwise re-hash on every visit.
+    """
+    try:
+        return int(hashed_password.split("$")[2]) < _bcrypt_rounds
+    except (IndexError, ValueError):
+        return False
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -28,7 +90,28 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     raw = password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
-    return bcrypt.hashpw(raw, bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(raw, bcrypt.gensalt(rounds=_bcrypt_rounds)).decode("utf-8")
+
+
+async def hash_password(password: str) -> str:
+    """get_password_hash on the bounded hashing pool."""
+    return await hashing_pool.run(get_password_hash, password)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The caller without its User row: built from token claims in stateless auth mode, or a
+    snapshot of the row in cached mode (the only mode that fills trust_score).
+    """
+    id: int
+    role: str
+    email: str
+    trust_score: Optional[float] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, role=user.role, email=user.email, trust_score=user.trust_score)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -38,6 +121,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, get_settings().secret_key, algorithm=ALGORITHM)
 
 
+def issue_token(user: User) -> str:
+    """Access token for user, carrying the claims stateless auth needs (role, email, token version)."""
+    return create_access_token(data={
+        "sub": str(user.id), "role": user.role, "email": user.email, "tv": user.token_version or 0,
+    })
+
+
 def decode_token(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(token, get_settings().secret_key, algorithms=[ALGORITHM])
@@ -47,37 +137,126 @@ def decode_token(token: str) -> Optional[dict]:
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+    return db.query(User).options(undefer(User.password_hash)).filter(User.email == email).first()
 
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.password_hash):
+async def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    """The user if the password matches, detached from db. DB work runs on the threadpool and the
+    connection goes back to the pool before the (possibly queued) hash check."""
+    user = await run_in_threadpool(_load_login_user, db, email)
+    if not user or not await hashing_pool.run(verify_password, password, user.password_hash):
         return None
+    if needs_rehash(user.password_hash):
+        await _rehash(db, user, password)
     return user
 
 
+def _load_login_user(db: Session, email: str) -> Optional[User]:
+    user = get_user_by_email(db, email)
+    if user is not None:
+        db.expunge(user)
+    db.rollback()
+    return user
+
+
+async def _rehash(db: Session, user: User, password: str) -> None:
+    """Store the password again at the current cost. Best effort: login succeeds regardless."""
+    try:
+        new_hash = await hashing_pool.run(get_password_hash, password)
+        await run_in_threadpool(_store_rehash, db, user, new_hash)
+        user.password_hash = new_hash
+    except HTTPException:
+        pass  # hashing pool saturated; upgrade on a later login
+    except Exception:
+        logger.exception("Password rehash failed for user %s", user.id)
+
+
+def _store_rehash(db: Session, user: User, new_hash: str) -> None:
+    try:
+        db.query(User).filter(User.id == user.id, User.password_hash == user.password_hash).update(
+            {User.password_hash: new_hash}, synchronize_session=False,
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _claims(credentials: Optional[HTTPAuthorizationCredentials]) -> Optional[dict]:
+    if not credentials:
+        return None
+    payload = decode_token(credentials.credentials)
+    if not payload or "sub" not in payload:
+        return None
+    return payload
+
+
 async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
     db: Session = Depends(get_db),
 ) -> Optional[User]:
-    if not credentials:
+    payload = _claims(credentials)
+    if payload is None:
         return None
-    payload = decode_token(credentials.credentials)
-    if not payload or "sub" not in payload:
+    user = get_user_by_id(db, int(payload["sub"]))
+    if user is None or payload.get("tv", 0) < (user.token_version or 0):
         return None
-    user_id = int(payload["sub"])
-    user = get_user_by_id(db, user_id)
     return user
 
 
-async def require_user(
-    user: Optional[User] = Depends(get_current_user),
-) -> User:
+async def get_current_principal(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: Session = Depends(get_db),
+) -> Optional[Union[User, Principal]]:
+    """
+    The caller: in "db" auth mode the User row, in "stateless" mode a Principal built from the
+    token claims without touching the DB (tokens issued before the claims existed still load the
+    user), in "cached" mode a Principal snapshot reused per token for a short TTL.
+    """
+    mode = get_settings().auth_mode
+    if mode == "cached":
+        return await _cached_principal(credentials, db)
+    if mode == "stateless":
+        payload = _claims(credentials)
+        if payload is None:
+            return None
+        if "role" in payload and "email" in payload:
+            user_id = int(payload["sub"])
+            if payload.get("tv", 0) < token_versions.current(user_id):
+                return None
+            return Principal(id=user_id, role=payload["role"], email=payload["email"])
+    return await get_current_user(credentials, db)
+
+
+async def _cached_principal(credentials: Optional[HTTPAuthorizationCredentials], db: Session) -> Optional[Principal]:
+    if not credentials:
+        return None
+    principal = principal_cache.get(credentials.credentials)
+    if principal is not None:
+        return principal
+    payload = _claims(credentials)
+    if payload is None:
+        return None
+    principal = await run_in_threadpool(_load_principal, db, payload)
+    if principal is None:
+        return None
+    principal_cache.put(credentials.credentials, principal, token_expires_at=payload.get("exp"))
+    return principal
+
+
+def _load_principal(db: Session, payload: dict) -> Optional[Principal]:
+    """Cache miss: load the token's user (blocking DB work, run off the event loop)."""
+    user = get_user_by_id(db, int(payload["sub"]))
+    if user is None or payload.get("tv", 0) < (user.token_version or 0):
+        return None
+    return Principal.from_user(user)
+
+
+def _require(user):
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -87,9 +266,38 @@ async def require_user(
     return user
 
 
+async def require_user(
+    user: Optional[Union[User, Principal]] = Depends(get_current_principal),
+) -> Union[User, Principal]:
+    """The authenticated caller, with at least id, role and email (see get_current_principal)."""
+    return _require(user)
+
+
+async def require_db_user(
+    user: Optional[User] = Depends(get_current_user),
+) -> User:
+    """The authenticated caller's User row, in every auth mode; for handlers that read or change it."""
+    return _require(user)
+
+
+async def require_admin(user: User = Depends(require_user)) -> User:
+    admins = {e.strip().lower() for e in get_settings().admin_emails.split(",") if e.strip()}
+    if user.email.lower() not in admins:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    return user
+
+
 def require_role(*roles: str):
-    async def _require_role(user: User = Depends(require_user)) -> User:
+    async def _require_role(user: Union[User, Principal] = Depends(require_user)) -> Union[User, Principal]:
         if user.role not in roles:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return user
     return _require_role
+
+
+def require_db_role(*roles: str):
+    async def _require_db_role(user: User = Depends(require_db_user)) -> User:
+        if user.role not in roles:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        return user
+    return _require_db_role
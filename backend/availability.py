@@ -0,0 +1,111 @@
+"""
+Provider availability: busy slots (scheduled bookings and time off) and overlap checks.
+Every slot is at most settings.max_busy_slot_hours long, so a slot overlapping [start, end)
+must start in (start - max, end). "Is this provider busy" is then a range scan on the
+(provider_id, start_at) index bounded by that window, whatever the provider's history.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import and_, exists, select
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from models import ProviderBusySlot, User
+
+settings = get_settings()
+
+
+def max_slot() -> timedelta:
+    return timedelta(hours=settings.max_busy_slot_hours)
+
+
+def max_time_off() -> timedelta:
+    return timedelta(days=settings.max_time_off_days)
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Timestamps are stored as naive UTC, like the rest of the schema."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def validate_interval(
+    start: Optional[datetime], end: Optional[datetime], max_length: Optional[timedelta] = None,
+    future: bool = False,
+) -> Optional[tuple[datetime, datetime]]:
+    """
+    Return (start, end) as naive UTC, or None if neither is given. With future, start must be
+    after the current time. Raises ValueError if invalid.
+    """
+    if start is None and end is None:
+        return None
+    if start is None or end is None:
+        raise ValueError("Both start and end are required")
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise ValueError("End must be after start")
+    if future and start <= datetime.utcnow():
+        raise ValueError("Start must be in the future")
+    if max_length is not None and end - start > max_length:
+        raise ValueError(f"Interval is longer than {max_length.total_seconds() / 3600:g} hours")
+    return start, end
+
+
+def overlaps(provider_id, start: datetime, end: datetime):
+    """Clause: a busy slot of provider_id (a value or a correlated column) overlaps [start, end)."""
+    return and_(
+        ProviderBusySlot.provider_id == provider_id,
+        ProviderBusySlot.start_at > start - max_slot(),
+        ProviderBusySlot.start_at < end,
+        ProviderBusySlot.end_at > start,
+    )
+
+
+def free_clause(provider_id_column, start: datetime, end: datetime):
+    """Clause for provider queries: the provider has no busy slot overlapping [start, end)."""
+    return ~exists().where(overlaps(provider_id_column, start, end))
+
+
+def is_free(db: Session, provider_id: int, start: datetime, end: datetime, ignore: tuple[int, ...] = ()) -> bool:
+    q = select(ProviderBusySlot.id).where(overlaps(provider_id, start, end))
+    if ignore:
+        q = q.where(ProviderBusySlot.id.notin_(ignore))
+    return db.execute(q.limit(1)).first() is None
+
+
+def reserve(
+    db: Session, provider_id: int, start: datetime, end: datetime, booking_id: Optional[int] = None,
+) -> Optional[list[ProviderBusySlot]]:
+    """
+    Mark [start, end) busy, split into slots of at most max_busy_slot_hours that share a
+    group_id (the first slot's id), so time off is removed as a whole.
+    The provider's users row is locked first (SELECT ... FOR UPDATE; SQLite's single writer
+    serializes the same way), then the slots are written and the overlap check excludes only
+    them, so two concurrent overlapping reservations for one provider cannot both succeed.
+    Returns the slots, or None on conflict after removing them again; does not commit.
+    """
+    db.execute(select(User.id).where(User.id == provider_id).with_for_update())
+    slots = []
+    cursor = start
+    while cursor < end:
+        slot_end = min(end, cursor + max_slot())
+        slots.append(ProviderBusySlot(provider_id=provider_id, start_at=cursor, end_at=slot_end, booking_id=booking_id))
+        cursor = slot_end
+    db.add_all(slots)
+    db.flush()
+    if not is_free(db, provider_id, start, end, ignore=tuple(s.id for s in slots)):
+        for slot in slots:
+            db.delete(slot)
+        db.flush()
+        return None
+    for slot in slots:
+        slot.group_id = slots[0].id
+    db.flush()
+    return slots
+
+
+def release_booking(db: Session, booking_id: int) -> None:
+    """Free the time held by a booking (on cancellation); does not commit."""
+    db.query(ProviderBusySlot).filter(ProviderBusySlot.booking_id == booking_id).delete(synchronize_session=False)
@@ -0,0 +1,171 @@
+"""
+Expiry of pending bookings the provider did not accept in time.
+Each booking gets an accept_by deadline at creation. A single scheduler thread keeps a
+min-heap of (accept_by, booking id): it is loaded once at startup from the
+(status, accept_by) index and then fed by booking creation, so the table is never scanned
+on a timer. When deadlines pass, the due bookings are cancelled in one conditional UPDATE
+(still pending and overdue), so bookings accepted or cancelled meanwhile are skipped and
+several processes can run schedulers without cancelling anything twice.
+"""
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from availability import naive_utc, release_booking
+from config import get_settings
+from database import SessionLocal
+from models import Booking
+from provider_stats import bump, status_deltas
+from trust_worker import trust_queue
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+IDLE_WAIT_SECONDS = 3600.0  # nothing scheduled: wake up now and then anyway
+RETRY_SECONDS = 60.0  # a failed batch is tried again after this delay
+
+
+def resolve_accept_by(requested: Optional[datetime], scheduled_start: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Acceptance deadline of a new booking: the requested one (naive UTC), else
+    settings.booking_accept_hours from now but no later than the scheduled start.
+    None when no deadline applies. Raises ValueError if requested is not in the future.
+    """
+    now = datetime.utcnow()
+    if requested is not None:
+        requested = naive_utc(requested)
+        if requested <= now:
+            raise ValueError("accept_by must be in the future")
+        return requested
+    hours = get_settings().booking_accept_hours
+    if hours <= 0:
+        return None
+    deadline = now + timedelta(hours=hours)
+    if scheduled_start is not None and now < scheduled_start < deadline:
+        deadline = scheduled_start
+    return deadline
+
+
+def expire_bookings(db: Session, booking_ids: list[int], now: datetime) -> list[tuple[int, int]]:
+    """
+    Cancel those of booking_ids that are still pending with accept_by <= now, update provider
+    stats and free their slots. Returns [(booking id, provider id)] cancelled; commits.
+    """
+    conditions = (Booking.id.in_(booking_ids), Booking.status == "pending", Booking.accept_by <= now)
+    stmt = (
+        update(Booking)
+        .where(*conditions)
+        .values(status="cancelled", version=Booking.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if db.bind.dialect.update_returning:
+        expired = [tuple(r) for r in db.execute(stmt.returning(Booking.id, Booking.provider_id))]
+    else:
+        expired = [tuple(r) for r in db.execute(select(Booking.id, Booking.provider_id).where(*conditions))]
+        if expired:
+            db.execute(stmt.where(Booking.id.in_([b for b, _ in expired])))
+    per_provider: dict[int, int] = {}
+    for booking_id, provider_id in expired:
+        release_booking(db, booking_id)
+        per_provider[provider_id] = per_provider.get(provider_id, 0) + 1
+    deltas = status_deltas("pending", "cancelled")
+    for provider_id, count in per_provider.items():
+        bump(db, provider_id, **{k: v * count for k, v in deltas.items()})
+    db.commit()
+    for provider_id in per_provider:
+        trust_queue.enqueue(provider_id)
+    return expired
+
+
+class BookingExpiryScheduler:
+    def __init__(self, session_factory: Callable = SessionLocal):
+        self.session_factory = session_factory
+        self._heap: list[tuple[datetime, int]] = []
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def schedule(self, booking_id: int, accept_by: Optional[datetime]) -> None:
+        if accept_by is None:
+            return
+        with self._cond:
+            heapq.heappush(self._heap, (accept_by, booking_id))
+            if self._heap[0][1] == booking_id:
+                self._cond.notify()  # new earliest deadline
+
+    def load(self) -> int:
+        """Schedule every pending booking with a deadline. Returns how many were loaded."""
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(Booking.accept_by, Booking.id).where(Booking.status == "pending", Booking.accept_by.isnot(None))
+            ).all()
+        finally:
+            db.close()
+        with self._cond:
+            self._heap.extend((accept_by, booking_id) for accept_by, booking_id in rows)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        return len(rows)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="booking-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_due(self, now: Optional[datetime] = None) -> int:
+        """Expire every scheduled booking due by now, in the calling thread. Returns how many were cancelled."""
+        now = now or datetime.utcnow()
+        cancelled = 0
+        while True:
+            with self._cond:
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < BATCH_SIZE:
+                    due.append(heapq.heappop(self._heap)[1])
+            if not due:
+                return cancelled
+            db = self.session_factory()
+            try:
+                cancelled += len(expire_bookings(db, due, now))
+            except Exception:
+                db.rollback()
+                logger.exception("Expiring %d bookings failed", len(due))
+                retry_at = now + timedelta(seconds=RETRY_SECONDS)
+                for booking_id in due:
+                    self.schedule(booking_id, retry_at)
+                return cancelled
+            finally:
+                db.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                if self._heap:
+                    wait = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                else:
+                    wait = IDLE_WAIT_SECONDS
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+            self.run_due()
+
+
+expiry_scheduler = BookingExpiryScheduler()
@@ -0,0 +1,97 @@
+"""
+Booking history: a user's bookings, newest first, with keyset pagination.
+A user's bookings are the union of those they made (customer_id) and those they serve
+(provider_id). Each side is a range scan on its (user column, created_at) index; the two
+are merged with UNION ALL rather than an OR that no single index can serve. The cursor
+carries the last (created_at, id) seen.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from models import Booking
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Columns of BookingResponse, selected directly for list responses.
+BOOKING_COLUMNS = (
+    Booking.id, Booking.customer_id, Booking.provider_id, Booking.service_type,
+    Booking.subject, Booking.total_price, Booking.status, Booking.scheduled_start, Booking.scheduled_end,
+    Booking.accept_by, Booking.version, Booking.created_at,
+)
+
+
+def booking_dict(row) -> dict:
+    """A row holding BOOKING_COLUMNS as a BookingResponse-shaped dict."""
+    return {c.key: row._mapping[c.key] for c in BOOKING_COLUMNS}
+
+
+def encode_cursor(created_at: datetime, booking_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), booking_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Return (created_at, id) from an opaque cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, booking_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(booking_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _side(
+    user_column, user_id: int, statuses: list[str], created_from: Optional[datetime],
+    created_to: Optional[datetime], after: Optional[tuple[datetime, int]], limit: int,
+):
+    """One side of the union: newest limit + 1 bookings where user_column == user_id."""
+    q = select(*BOOKING_COLUMNS).where(user_column == user_id)
+    if statuses:
+        q = q.where(Booking.status.in_(statuses))
+    if created_from is not None:
+        q = q.where(Booking.created_at >= created_from)
+    if created_to is not None:
+        q = q.where(Booking.created_at < created_to)
+    if after is not None:
+        q = q.where(tuple_(Booking.created_at, Booking.id) < tuple_(*after))
+    return q.order_by(Booking.created_at.desc(), Booking.id.desc()).limit(limit + 1)
+
+
+def history_page(
+    db: Session,
+    user_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    statuses: Optional[list[str]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of the user's bookings as customer or provider, newest first, optionally
+    restricted to statuses and to created_from <= created_at < created_to.
+    Returns (bookings, next_cursor); next_cursor is None on the last page.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    statuses = statuses or []
+    as_customer = _side(Booking.customer_id, user_id, statuses, created_from, created_to, after, limit)
+    # A booking where the user is both sides is already in the customer half.
+    as_provider = _side(Booking.provider_id, user_id, statuses, created_from, created_to, after, limit).where(
+        Booking.customer_id != user_id
+    )
+    merged = union_all(
+        select(*as_customer.subquery().c), select(*as_provider.subquery().c),
+    ).subquery()
+    rows = db.execute(
+        select(merged).order_by(merged.c.created_at.desc(), merged.c.id.desc()).limit(limit + 1)
+    ).all()
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+    return [row._asdict() for row in page], next_cursor
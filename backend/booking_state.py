@@ -0,0 +1,79 @@
+"""
+Booking state machine: each status change is one conditional UPDATE.
+The WHERE clause carries the allowed source states, who may make the change and, when the
+client sends one, the version it last saw; the version is bumped on every change. Two
+concurrent requests for the same transition cannot both match, so side effects (stats,
+trust recompute) run once. The booking is read back with RETURNING where the dialect
+supports it; the reason for a non-match is only looked up after the UPDATE fails.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from booking_history import BOOKING_COLUMNS
+from models import Booking
+
+# Read back with the booking for completion side effects (earnings rollups); not part of the response.
+SETTLEMENT_COLUMNS = (Booking.commission_amount, Booking.provider_earning, Booking.completed_at)
+
+# new status -> statuses it may be reached from
+TRANSITIONS = {
+    "accepted": ("pending",),
+    "completed": ("accepted",),
+    "cancelled": ("pending", "accepted"),
+}
+
+
+def _actor_clause(new_status: str, user_id: int):
+    if new_status == "accepted":
+        return Booking.provider_id == user_id
+    return or_(Booking.customer_id == user_id, Booking.provider_id == user_id)
+
+
+def transition(
+    db: Session, booking_id: int, user_id: int, new_status: str, expected_version: Optional[int] = None,
+):
+    """
+    Move a booking to new_status if it is in an allowed state, user_id may make the change and
+    (when given) its version is expected_version. Returns the updated row (BOOKING_COLUMNS and
+    SETTLEMENT_COLUMNS) or None when nothing matched; does not commit. Raises ValueError for an unknown status.
+    """
+    if new_status not in TRANSITIONS:
+        raise ValueError(f"Invalid status. Allowed: {list(TRANSITIONS)}")
+    conditions = [
+        Booking.id == booking_id,
+        Booking.status.in_(TRANSITIONS[new_status]),
+        _actor_clause(new_status, user_id),
+    ]
+    if expected_version is not None:
+        conditions.append(Booking.version == expected_version)
+    values = {"status": new_status, "version": Booking.version + 1}
+    if new_status == "completed":
+        values["completed_at"] = datetime.utcnow()
+    stmt = update(Booking).where(*conditions).values(**values).execution_options(synchronize_session=False)
+    columns = BOOKING_COLUMNS + SETTLEMENT_COLUMNS
+    if db.bind.dialect.update_returning:
+        return db.execute(stmt.returning(*columns)).first()
+    if db.execute(stmt).rowcount != 1:
+        return None
+    return db.execute(select(*columns).where(Booking.id == booking_id)).first()
+
+
+def transition_failure(
+    db: Session, booking_id: int, user_id: int, new_status: str, expected_version: Optional[int] = None,
+) -> tuple[int, str]:
+    """(HTTP status, message) explaining why transition() matched nothing."""
+    booking = db.execute(
+        select(Booking.customer_id, Booking.provider_id, Booking.status, Booking.version).where(Booking.id == booking_id)
+    ).first()
+    if booking is None:
+        return 404, "Booking not found"
+    if new_status == "accepted" and booking.provider_id != user_id:
+        return 403, "Only provider can accept"
+    if user_id not in (booking.customer_id, booking.provider_id):
+        return 403, "Only customer or provider can complete/cancel"
+    if expected_version is not None and booking.version != expected_version:
+        return 409, f"Booking was modified (current version {booking.version})"
+    return 409, f"Cannot change booking from {booking.status} to {new_status}"
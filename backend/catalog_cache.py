@@ -0,0 +1,81 @@
+"""
+In-process cache of approved-provider catalog reads (search pages, chat recommendations).
+Each entry is tagged with the categories (service_types / tutor subjects) it was read from,
+so a change to a provider drops every entry that could contain it. TTL bounds staleness
+across worker processes; writes in this process invalidate explicitly.
+"""
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional, Union
+
+from config import get_settings
+
+MAX_ENTRIES = 4096
+
+
+class CatalogCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, tuple[float, Any]] = {}  # insertion-ordered, oldest first
+        self._by_category: dict[str, set] = {}
+        self._generations: dict[str, int] = {}
+        self._epoch = 0  # bumped by clear()
+
+    def get_or_load(self, categories: Union[str, tuple[str, ...]], variant: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for (categories, variant), calling loader() on a miss."""
+        if self.ttl_seconds <= 0:
+            return loader()
+        if isinstance(categories, str):
+            categories = (categories,)
+        key = (categories, variant)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] > now:
+                return hit[1]
+            generations = (self._epoch, [self._generations.get(c, 0) for c in categories])
+        value = loader()
+        with self._lock:
+            # Don't store a value loaded before an invalidation that raced with it.
+            if generations == (self._epoch, [self._generations.get(c, 0) for c in categories]):
+                self._entries.pop(key, None)
+                while len(self._entries) >= self.max_entries:
+                    self._drop(next(iter(self._entries)))
+                self._entries[key] = (now + self.ttl_seconds, value)
+                for c in categories:
+                    self._by_category.setdefault(c, set()).add(key)
+        return value
+
+    def _drop(self, key) -> None:
+        self._entries.pop(key, None)
+        for c in key[0]:
+            keys = self._by_category.get(c)
+            if keys is not None:
+                keys.discard(key)
+
+    def invalidate(self, *categories: Optional[str]) -> None:
+        with self._lock:
+            for category in categories:
+                if not category:
+                    continue
+                for key in list(self._by_category.pop(category, ())):
+                    self._drop(key)
+                self._generations[category] = self._generations.get(category, 0) + 1
+
+    def invalidate_profile(self, *profiles) -> None:
+        """Invalidate the categories of the given WorkerProfile/TutorProfile objects (None is ignored)."""
+        self.invalidate(*(
+            getattr(p, "service_type", None) or getattr(p, "subject", None)
+            for p in profiles if p is not None
+        ))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._by_category.clear()
+
+
+catalog_cache = CatalogCache(ttl_seconds=get_settings().catalog_cache_ttl_seconds)
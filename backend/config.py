@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from pydantic_settings import BaseSettings
+from typing import Literal
 from pydantic import field_validator
 from functools import lru_cache
 
@@ -17,6 +18,35 @@ class Settings(BaseSettings):
     database_url: str = "sqlite:///./urban.db"
     upload_dir: str = "uploads"
     commission_rate: float = 0.30  # 30%
+    catalog_cache_ttl_seconds: float = 30.0  # 0 disables the approved-provider cache
+    # Provider rank_score = weighted blend of trust (0-100), rating (0-5) and price (cheaper is better)
+    rank_weight_trust: float = 0.5
+    rank_weight_rating: float = 0.35
+    rank_weight_price: float = 0.15
+    rank_price_reference: float = 1000.0  # price at which the price component is half its maximum
+    trust_recompute_debounce_seconds: float = 2.0  # coalescing window of the background trust recompute
+    # "db": every authenticated request loads the user; "stateless": role-gated endpoints trust the
+    # token's role claim, with revocation via token_version (token_versions.py); "cached": the
+    # verified token's user snapshot is reused for a short TTL (principal_cache.py)
+    auth_mode: Literal["db", "stateless", "cached"] = "db"
+    token_version_refresh_seconds: float = 5.0  # how stale the stateless revocation map may get
+    access_token_expire_minutes: int = 60 * 24  # also how long a revocation is kept in the stateless map
+    principal_cache_ttl_seconds: float = 30.0
+    principal_cache_max_entries: int = 10_000
+    bcrypt_target_ms: float = 250.0  # startup calibration picks the bcrypt cost closest to this per hash
+    bcrypt_rounds: int = 0  # fixed bcrypt cost instead of calibrating; 0 calibrates (pin it across load-balanced nodes)
+    hashing_workers: int = 2  # threads of the bcrypt pool (hashing_pool.py)
+    hashing_queue_limit: int = 32  # waiting hash jobs beyond the running ones before 503
+    # Login attempts allowed per email / per client IP, as "count/seconds" windows (rate_limit.py)
+    login_limit_per_email: str = "10/60,50/3600"
+    login_limit_per_ip: str = "30/60,300/3600"
+    rate_limit_backend: Literal["memory", "redis"] = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    idempotency_ttl_seconds: float = 24 * 3600.0  # how long a stored Idempotency-Key response is replayed
+    admin_emails: str = ""  # comma-separated; these users can read platform revenue
+    booking_accept_hours: float = 24.0  # pending bookings not accepted within this are cancelled; 0 disables
+    max_busy_slot_hours: float = 12.0  # longest booking; longer time off is stored as slots of at most this length
+    max_time_off_days: float = 31.0  # longest single time-off request (bounds the slots it writes)
 
     class Config:
         env_file = _env_file_path()
@@ -0,0 +1,150 @@
+"""
+Earnings rollups: completed-booking totals per day, kept in provider_earnings_daily and
+platform_revenue_daily. Each completion adds its amounts with one atomic upsert per table in
+the booking's transaction, so earnings and revenue reports read one row per day and category
+rather than every booking. rebuild_earnings() recreates both tables from bookings.
+
+Usage: python earnings.py rebuild
+"""
+import sys
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Booking, ProviderEarningsDaily, PlatformRevenueDaily
+
+AMOUNTS = ("completed_bookings", "gross_amount", "commission_amount", "provider_earning")
+DEFAULT_REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+
+
+def booking_category(service_type: str, subject: Optional[str]) -> str:
+    """Rollup category of a booking: its tutor subject, else its service type."""
+    return subject or service_type
+
+
+def _upsert(db: Session, model, keys: dict, amounts: dict) -> None:
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    table = model.__table__
+    stmt = insert(table).values(**keys, **amounts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in keys],
+        set_={c: table.c[c] + stmt.excluded[c] for c in amounts},
+    )
+    db.execute(stmt)
+
+
+def record_completion(
+    db: Session, provider_id: int, category: str, completed_at: datetime,
+    total_price: float, commission_amount: float, provider_earning: float,
+) -> None:
+    """Add one completed booking to the provider and platform rollups for its day; does not commit."""
+    amounts = {
+        "completed_bookings": 1, "gross_amount": total_price,
+        "commission_amount": commission_amount, "provider_earning": provider_earning,
+    }
+    day = completed_at.date()
+    _upsert(db, ProviderEarningsDaily, {"provider_id": provider_id, "day": day, "service_type": category}, amounts)
+    _upsert(db, PlatformRevenueDaily, {"day": day, "service_type": category}, amounts)
+
+
+def report_range(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    """Inclusive (start, end) days, defaulting to the last DEFAULT_REPORT_DAYS. Raises ValueError if invalid."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days >= MAX_REPORT_DAYS:
+        raise ValueError(f"Range is longer than {MAX_REPORT_DAYS} days")
+    return start, end
+
+
+def _rows(q) -> list[dict]:
+    return [
+        {
+            "day": r.day, "service_type": r.service_type, "completed_bookings": r.completed_bookings,
+            "gross_amount": round(r.gross_amount, 2), "commission_amount": round(r.commission_amount, 2),
+            "provider_earning": round(r.provider_earning, 2),
+        }
+        for r in q
+    ]
+
+
+def provider_earnings(db: Session, provider_id: int, start: date, end: date) -> list[dict]:
+    """The provider's daily totals in [start, end], oldest first."""
+    return _rows(
+        db.query(ProviderEarningsDaily)
+        .filter(
+            ProviderEarningsDaily.provider_id == provider_id,
+            ProviderEarningsDaily.day >= start,
+            ProviderEarningsDaily.day <= end,
+        )
+        .order_by(ProviderEarningsDaily.day, ProviderEarningsDaily.service_type)
+    )
+
+
+def platform_revenue(db: Session, start: date, end: date, service_types: Optional[list[str]] = None) -> list[dict]:
+    """Platform daily totals in [start, end] per category, oldest first."""
+    q = db.query(PlatformRevenueDaily).filter(PlatformRevenueDaily.day >= start, PlatformRevenueDaily.day <= end)
+    if service_types:
+        q = q.filter(PlatformRevenueDaily.service_type.in_(service_types))
+    return _rows(q.order_by(PlatformRevenueDaily.day, PlatformRevenueDaily.service_type))
+
+
+def rebuild_earnings(db: Session) -> int:
+    """Recreate both rollup tables from completed bookings. Returns the number of completed bookings."""
+    # Bookings completed before completed_at existed fall back to their last update.
+    completed_at = func.coalesce(Booking.completed_at, Booking.updated_at, Booking.created_at)
+    rows = db.query(
+        Booking.provider_id, completed_at, Booking.service_type, Booking.subject,
+        Booking.total_price, Booking.commission_amount, Booking.provider_earning,
+    ).filter(Booking.status == "completed")
+    provider_rows: dict[tuple, dict] = {}
+    platform_rows: dict[tuple, dict] = {}
+    count = 0
+    for provider_id, at, service_type, subject, total, commission, earning in rows:
+        day = at.date() if isinstance(at, datetime) else datetime.fromisoformat(str(at)).date()
+        category = booking_category(service_type, subject)
+        for key, out in (((provider_id, day, category), provider_rows), ((day, category), platform_rows)):
+            totals = out.setdefault(key, dict.fromkeys(AMOUNTS, 0))
+            totals["completed_bookings"] += 1
+            totals["gross_amount"] += total or 0.0
+            totals["commission_amount"] += commission or 0.0
+            totals["provider_earning"] += earning or 0.0
+        count += 1
+    db.query(ProviderEarningsDaily).delete()
+    db.query(PlatformRevenueDaily).delete()
+    if provider_rows:
+        db.execute(ProviderEarningsDaily.__table__.insert(), [
+            {"provider_id": p, "day": d, "service_type": c, **t} for (p, d, c), t in provider_rows.items()
+        ])
+        db.execute(PlatformRevenueDaily.__table__.insert(), [
+            {"day": d, "service_type": c, **t} for (d, c), t in platform_rows.items()
+        ])
+    db.commit()
+    return count
+
+
+def ensure_earnings(db: Session) -> None:
+    """Build the rollups on first start against a database that already has completed bookings."""
+    if db.query(PlatformRevenueDaily.day).first() is not None:
+        return
+    if db.query(Booking.id).filter(Booking.status == "completed").first() is None:
+        return
+    rebuild_earnings(db)
+
+
+if __name__ == "__main__":
+    from database import Base, SessionLocal, engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("Usage: python earnings.py rebuild")
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt earnings from {rebuild_earnings(session)} completed bookings")
+    finally:
+        session.close()
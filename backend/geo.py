@@ -0,0 +1,156 @@
+"""
+Geolocation helpers: geohash bucketing and nearest-K provider lookup.
+Provider profiles store their owner's geohash, indexed after the category filter; a nearest
+query reads the 3x3 block of cells around the customer (one index range scan per cell) and refines candidates with a vectorized
+haversine, widening the cell size until the top K are provably the nearest.
+"""
+import math
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import and_, or_
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 9  # stored precision, ~5m cells
+SEARCH_PRECISIONS = (6, 5, 4, 3, 2, 1)  # ~1km cells down to whole-continent cells
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {c: i for i, c in enumerate(_BASE32)}
+PREFIX_END = "~"  # sorts after every base32 char: [prefix, prefix + "~") is the prefix range
+
+
+def validate_location(latitude: Optional[float], longitude: Optional[float]) -> Optional[tuple[float, float]]:
+    """Return (lat, lon) if both are given, None if neither. Raises ValueError if invalid."""
+    if latitude is None and longitude is None:
+        return None
+    if latitude is None or longitude is None:
+        raise ValueError("latitude and longitude must be given together")
+    if not -90.0 <= latitude <= 90.0 or not -180.0 <= longitude <= 180.0:
+        raise ValueError("latitude must be in [-90, 90] and longitude in [-180, 180]")
+    return float(latitude), float(longitude)
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits, ch, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> tuple[float, float, float, float]:
+    """Return (lat_lo, lat_hi, lon_lo, lon_hi) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _BASE32_INDEX[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def neighbourhood(latitude: float, longitude: float, precision: int) -> tuple[list[str], float]:
+    """
+    Geohash cells of the 3x3 block around the point, and the radius (km) within which
+    every point is guaranteed to lie inside the block.
+    """
+    lat_lo, lat_hi, lon_lo, lon_hi = geohash_bounds(geohash_encode(latitude, longitude, precision))
+    dlat, dlon = lat_hi - lat_lo, lon_hi - lon_lo
+    clat, clon = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+    cells = set()
+    for i in (-1, 0, 1):
+        nlat = clat + i * dlat
+        if not -90.0 < nlat < 90.0:
+            continue
+        for j in (-1, 0, 1):
+            nlon = (clon + j * dlon + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(nlat, nlon, precision))
+    # Distance to the block edge: at least one cell height north/south, and at least the
+    # distance to the meridian one cell width away east/west.
+    height = EARTH_RADIUS_KM * math.radians(dlat)
+    width = EARTH_RADIUS_KM * math.asin(min(1.0, math.cos(math.radians(latitude)) * math.sin(math.radians(min(dlon, 90.0)))))
+    return sorted(cells), min(height, width)
+
+
+def haversine_km(latitude: float, longitude: float, latitudes, longitudes) -> np.ndarray:
+    """Great-circle distance (km) from one point to arrays of points."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(longitudes, dtype=np.float64)) - math.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest(
+    load: Callable[[Optional[Sequence[str]]], list],
+    latitude: float,
+    longitude: float,
+    k: int,
+    after: Optional[tuple[float, int]] = None,
+) -> list[tuple[float, object]]:
+    """
+    Nearest k rows to (latitude, longitude), ordered by (distance, id), strictly after
+    the (distance, id) cursor if given. load(cells) returns rows with .id, .latitude and
+    .longitude whose geohash starts with one of the cells (cells=None means all located rows).
+    Returns [(distance_km, row), ...].
+    """
+    precisions = list(SEARCH_PRECISIONS)
+    while precisions:
+        cells, radius = neighbourhood(latitude, longitude, precisions.pop(0))
+        ranked = _rank(load(cells), latitude, longitude, after)
+        if len(ranked) >= k:
+            if ranked[k - 1][0] <= radius:
+                return ranked[:k]
+            # The k-th candidate bounds the answer: jump to the first block that covers it
+            # instead of re-reading every level in between.
+            bound = ranked[k - 1][0]
+            precisions = [p for p in precisions if neighbourhood(latitude, longitude, p)[1] >= bound][:1]
+    return _rank(load(None), latitude, longitude, after)[:k]
+
+
+def _rank(rows: list, latitude: float, longitude: float, after: Optional[tuple[float, int]]) -> list[tuple[float, object]]:
+    if not rows:
+        return []
+    distances = haversine_km(latitude, longitude, [r.latitude for r in rows], [r.longitude for r in rows])
+    ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+    order = np.lexsort((ids, distances))
+    if after is not None:
+        after_distance, after_id = after
+        keep = (distances > after_distance) | ((distances == after_distance) & (ids > after_id))
+        order = order[keep[order]]
+    return [(float(distances[i]), rows[i]) for i in order.tolist()]
+
+
+def prefix_filter(column, cells: Sequence[str]):
+    """SQL filter matching geohashes under any of the cells, as index range scans."""
+    return or_(*[and_(column >= cell, column < cell + PREFIX_END) for cell in cells])
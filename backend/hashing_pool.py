@@ -0,0 +1,69 @@
+"""
+Bounded worker pool for password hashing (bcrypt hashpw / checkpw).
+Hashing runs on its own small thread pool instead of the event loop's shared thread limiter,
+so a login or registration burst queues here while search and bookings keep their threads.
+bcrypt releases the GIL while hashing, so threads use multiple cores. Beyond
+settings.hashing_queue_limit waiting jobs, new ones are rejected at once with 503 and
+Retry-After rather than queueing without bound.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+from config import get_settings
+
+RETRY_AFTER_SECONDS = 1
+
+
+class HashingPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0  # running + queued
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hashing")
+            return self._executor
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool. Raises HTTPException 503 when the pool's queue is full."""
+        executor = self._get_executor()
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_limit:
+                raise HTTPException(
+                    503, "Too many authentication requests, retry shortly",
+                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+                )
+            self._in_flight += 1
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_settings = get_settings()
+hashing_pool = HashingPool(workers=_settings.hashing_workers, queue_limit=_settings.hashing_queue_limit)
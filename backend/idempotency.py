@@ -0,0 +1,98 @@
+"""
+Idempotency keys for create endpoints (POST /api/bookings, POST /api/ratings).
+A client retrying with the same Idempotency-Key header gets the stored response of the first
+successful attempt, without the handler running again. Entries are scoped to (endpoint, user,
+key), remember a fingerprint of the request body so a key reused for a different request is
+rejected, and expire after settings.idempotency_ttl_seconds. While the first attempt is still
+running, the key holds an in-flight marker and concurrent retries get 409.
+Error responses are not stored; a retry after one runs the request again. Entries live in
+this process only, so multi-worker deployments should route retries to the same worker.
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from config import get_settings
+from serialization import dumps
+
+MAX_KEY_LENGTH = 255
+MAX_ENTRIES = 100_000
+REPLAY_HEADER = "Idempotent-Replayed"
+
+_IN_FLIGHT = object()
+
+
+def fingerprint(payload: Any) -> bytes:
+    """Digest of a request body, for detecting a key reused with different content."""
+    return hashlib.sha256(dumps(jsonable_encoder(payload))).digest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_seconds: float, max_entries: int = MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # scope -> (expires_at, fingerprint, (status_code, body) or _IN_FLIGHT); insertion-ordered
+        self._entries: dict[Hashable, tuple[float, bytes, Any]] = {}
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            scope, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) < self.max_entries:
+                break
+            del self._entries[scope]
+
+    def run(self, scope: Hashable, request_fingerprint: bytes, handler: Callable[[], Any], status_code: int = 200) -> Response:
+        """
+        Return the stored response for scope, or run handler() once and store its result.
+        Raises HTTPException 409 while another attempt with the key is running and 422 when
+        the key was used for a different request body.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is not None and entry[0] <= now:
+                del self._entries[scope]
+                entry = None
+            if entry is not None:
+                _, stored_fingerprint, outcome = entry
+                if stored_fingerprint != request_fingerprint:
+                    raise HTTPException(422, "Idempotency-Key was already used for a different request")
+                if outcome is _IN_FLIGHT:
+                    raise HTTPException(409, "A request with this Idempotency-Key is in progress")
+                stored_status, body = outcome
+                return Response(body, status_code=stored_status, media_type="application/json",
+                                headers={REPLAY_HEADER: "true"})
+            self._evict(now)
+            self._entries[scope] = (now + self.ttl_seconds, request_fingerprint, _IN_FLIGHT)
+        try:
+            body = dumps(jsonable_encoder(handler()))
+        except BaseException:
+            with self._lock:
+                self._entries.pop(scope, None)
+            raise
+        with self._lock:
+            self._entries[scope] = (time.monotonic() + self.ttl_seconds, request_fingerprint, (status_code, body))
+        return Response(body, status_code=status_code, media_type="application/json")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def check_key(key: Optional[str]) -> Optional[str]:
+    """Validate an Idempotency-Key header value. Raises HTTPException 400 if unusable."""
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    return key
+
+
+idempotency_store = IdempotencyStore(ttl_seconds=get_settings().idempotency_ttl_seconds)
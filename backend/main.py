@@ -1,61 +1,192 @@
 import os
+from datetime import date, datetime
+from typing import Optional
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
 
 from database import engine, get_db, Base, SessionLocal
 from config import get_settings
 from models import (
-    User, WorkerProfile, TutorProfile, Booking, Rating, AIDecisionLog,
-    HOME_SERVICE_TYPES, TUTOR_SUBJECTS,
+    User, WorkerProfile, TutorProfile, Booking, Rating, AIDecisionLog, ProviderBusySlot,
+    BookingStatus, HOME_SERVICE_TYPES, TUTOR_SUBJECTS,
 )
 from schemas import (
     UserCreate, UserLogin, Token, UserResponse,
     WorkerProfileCreate, WorkerProfileResponse,
     TutorProfileCreate, TutorProfileResponse,
-    BookingCreate, BookingResponse, BookingStatusUpdate,
-    RatingCreate, ProviderSearchResult,
+    BookingCreate, BookingResponse, BookingStatusUpdate, BookingBatchCreate, BookingBatchResult,
+    RatingCreate, ProviderSearchResult, LocationUpdate,
+    TimeOffCreate, BusySlotResponse, AvailabilityResponse, EarningsDay,
 )
 from auth import (
-    get_password_hash, authenticate_user, create_access_token,
-    get_current_user, require_user, require_role,
+    hash_password, authenticate_user, calibrate_bcrypt_rounds, issue_token,
+    require_user, require_role, require_admin, require_db_user, require_db_role,
 )
-from ai_engine import verify_identity, evaluate_tutor, compute_trust_score
+from ai_engine import verify_identity, evaluate_tutor, refresh_rank_score
+from availability import is_free, max_slot, max_time_off, naive_utc, release_booking, reserve, validate_interval
+from booking_expiry import expiry_scheduler, resolve_accept_by
+from booking_history import booking_dict, history_page
+from booking_state import TRANSITIONS, transition, transition_failure
+from catalog_cache import catalog_cache
+from earnings import (
+    booking_category, ensure_earnings, platform_revenue, provider_earnings, record_completion, report_range,
+)
+from geo import validate_location
+from hashing_pool import hashing_pool
+from idempotency import REPLAY_HEADER, check_key, fingerprint, idempotency_store
+from provider_search import search_page, parse_multi, SearchFilters, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from serialization import FastJSONResponse
+from provider_stats import (
+    add_profile_rating, bump as bump_provider_stats, ensure_profile_ratings, ensure_provider_stats, status_deltas,
+)
+from principal_cache import principal_cache
+from rate_limit import login_limiter
+from token_versions import ensure_revoked_at, token_versions
+from trust_worker import trust_queue
+from tutor_search import ensure_fts_index, fts_enabled, index_tutor_profile, search_tutors
 from routes.chat import router as chat_router
 from seed import seed_providers
 
 settings = get_settings()
 UPLOAD_DIR = settings.upload_dir
 COMMISSION_RATE = settings.commission_rate
-
-
-def _ensure_hourly_rate_columns():
-    """Add hourly_rate to worker_profiles and tutor_profiles if using SQLite and column missing."""
+MAX_BATCH_BOOKINGS = 500
+
+
+# (table, column, SQLite type) added after the first release
+_ADDED_COLUMNS = [
+    ("worker_profiles", "hourly_rate", "REAL"),
+    ("tutor_profiles", "hourly_rate", "REAL"),
+    ("users", "latitude", "REAL"),
+    ("users", "longitude", "REAL"),
+    ("users", "geohash", "VARCHAR(12)"),
+    ("worker_profiles", "rank_score", "REAL"),
+    ("tutor_profiles", "rank_score", "REAL"),
+    ("worker_profiles", "rating_sum", "REAL"),
+    ("worker_profiles", "rating_count", "INTEGER"),
+    ("tutor_profiles", "rating", "REAL NOT NULL DEFAULT 0"),
+    ("tutor_profiles", "rating_sum", "REAL"),
+    ("tutor_profiles", "rating_count", "INTEGER"),
+    ("bookings", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("bookings", "scheduled_start", "DATETIME"),
+    ("bookings", "scheduled_end", "DATETIME"),
+    ("bookings", "completed_at", "DATETIME"),
+    ("bookings", "accept_by", "DATETIME"),
+    ("users", "token_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "token_revoked_at", "DATETIME"),
+    ("worker_profiles", "geohash", "VARCHAR(12)"),
+    ("tutor_profiles", "geohash", "VARCHAR(12)"),
+    ("worker_profiles", "trust_score", "REAL"),
+    ("tutor_profiles", "trust_score", "REAL"),
+    ("provider_busy_slots", "group_id", "INTEGER"),
+]
+
+# Indexes created by an earlier release and since replaced
+_DROPPED_INDEXES = [
+    "ix_tutor_profiles_subject_status_scores",  # evaluation-score rating stand-in, replaced by tutor_profiles.rating
+    "ix_users_geohash",  # nearest lookups read the profiles' (category, status, geohash) indexes
+    "ix_users_trust_score",  # nothing filters or orders users by trust alone
+    "ix_users_token_version",  # revocations are read through ix_users_token_revoked_at
+]
+
+
+def _ensure_added_columns():
+    """Add columns introduced after a table was created if using SQLite and column missing."""
     if "sqlite" not in settings.database_url:
         return
+    for table, col, col_type in _ADDED_COLUMNS:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}"))
+        except Exception:
+            pass
+
+
+def _ensure_indexes():
+    """Create declared indexes missing from tables that predate them (create_all skips existing tables)."""
     with engine.begin() as conn:
-        for table, col in [("worker_profiles", "hourly_rate"), ("tutor_profiles", "hourly_rate")]:
-            try:
-                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col} REAL"))
-            except Exception:
-                pass
+        for name in _DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _backfill_rank_scores():
+    """Compute rank_score for profiles that predate it."""
+    db = SessionLocal()
+    try:
+        for model in (WorkerProfile, TutorProfile):
+            rows = db.query(model, User.trust_score).join(User, User.id == model.user_id).filter(
+                model.rank_score.is_(None)
+            ).all()
+            for profile, trust_score in rows:
+                refresh_rank_score(profile, trust_score)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _backfill_profile_geohashes():
+    """Copy the owner's geohash onto located profiles that predate the profile column."""
+    with engine.begin() as conn:
+        for table in ("worker_profiles", "tutor_profiles"):
+            conn.execute(text(
+                f"UPDATE {table} SET geohash = (SELECT geohash FROM users WHERE users.id = {table}.user_id) "
+                f"WHERE geohash IS NULL AND user_id IN (SELECT id FROM users WHERE geohash IS NOT NULL)"
+            ))
+
+
+def _backfill_profile_trust_scores():
+    """Copy the owner's trust_score onto profiles that predate the profile column."""
+    with engine.begin() as conn:
+        for table in ("worker_profiles", "tutor_profiles"):
+            conn.execute(text(
+                f"UPDATE {table} SET trust_score = "
+                f"COALESCE((SELECT trust_score FROM users WHERE users.id = {table}.user_id), 0) "
+                f"WHERE trust_score IS NULL"
+            ))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     os.makedirs(UPLOAD_DIR, exist_ok=True)
+    calibrate_bcrypt_rounds()
     Base.metadata.create_all(bind=engine)
-    _ensure_hourly_rate_columns()
+    _ensure_added_columns()
+    _ensure_indexes()
+    ensure_fts_index()
     try:
         db = SessionLocal()
         seed_providers(db)
         db.close()
     except Exception:
         pass
+    db = SessionLocal()
+    try:
+        ensure_provider_stats(db)
+        ensure_profile_ratings(db)
+        ensure_earnings(db)
+        ensure_revoked_at(db)
+    finally:
+        db.close()
+    _backfill_rank_scores()
+    _backfill_profile_geohashes()
+    _backfill_profile_trust_scores()
+    trust_queue.start()
+    expiry_scheduler.start()
+    if settings.auth_mode == "stateless":
+        token_versions.start()
     yield
-    pass
+    token_versions.stop()
+    expiry_scheduler.stop()
+    trust_queue.stop()
+    hashing_pool.shutdown()
 
 
 app = FastAPI(title="AI-Governed Home Services & Tutor Marketplace", lifespan=lifespan)
@@ -65,39 +196,75 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", REPLAY_HEADER],
 )
 app.include_router(chat_router, prefix="/api")
 
 
 # ---------- Auth ----------
-@app.post("/api/auth/register", response_model=Token)
-def register(data: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == data.email).first():
-        raise HTTPException(400, "Email already registered")
-    user = User(
-        name=data.name,
-        email=data.email,
-        password_hash=get_password_hash(data.password),
-        role=data.role,
-    )
+# Auth handlers are async: bcrypt waits on the hashing pool, not on the shared sync-route threads,
+# and their DB steps run on the threadpool so the event loop never waits on the database.
+def _email_taken(db: Session, email: str) -> bool:
+    taken = db.query(User.id).filter(User.email == email).first() is not None
+    db.rollback()  # release the connection while hashing
+    return taken
+
+
+def _create_user(db: Session, data: UserCreate, password_hash: str) -> User:
+    user = User(name=data.name, email=data.email, password_hash=password_hash, role=data.role)
     db.add(user)
     db.commit()
     db.refresh(user)
-    token = create_access_token(data={"sub": str(user.id)})
+    return user
+
+
+@app.post("/api/auth/register", response_model=Token)
+async def register(data: UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(_email_taken, db, data.email):
+        raise HTTPException(400, "Email already registered")
+    user = await run_in_threadpool(_create_user, db, data, await hash_password(data.password))
+    token = issue_token(user)
     return Token(access_token=token, user=UserResponse.model_validate(user))
 
 
 @app.post("/api/auth/login", response_model=Token)
-def login(data: UserLogin, db: Session = Depends(get_db)):
-    user = authenticate_user(db, data.email, data.password)
+async def login(data: UserLogin, request: Request, db: Session = Depends(get_db)):
+    # Throttled before the user lookup and the bcrypt check.
+    await run_in_threadpool(login_limiter.check, data.email, request.client.host if request.client else None)
+    user = await authenticate_user(db, data.email, data.password)
     if not user:
         raise HTTPException(401, "Invalid email or password")
-    token = create_access_token(data={"sub": str(user.id)})
+    token = issue_token(user)
     return Token(access_token=token, user=UserResponse.model_validate(user))
 
 
 @app.get("/api/auth/me", response_model=UserResponse)
-def me(user: User = Depends(require_user)):
+def me(user: User = Depends(require_db_user)):
+    return UserResponse.model_validate(user)
+
+
+@app.post("/api/auth/logout-all")
+def logout_all(user: User = Depends(require_db_user), db: Session = Depends(get_db)):
+    """Revoke every token issued to the user so far, including the one used for this call."""
+    user.token_version = (user.token_version or 0) + 1
+    user.token_revoked_at = datetime.utcnow()
+    db.commit()
+    token_versions.set(user.id, user.token_version)
+    principal_cache.invalidate_user(user.id)
+    return {"message": "Logged out everywhere"}
+
+
+@app.put("/api/auth/me/location", response_model=UserResponse)
+def update_my_location(data: LocationUpdate, user: User = Depends(require_db_user), db: Session = Depends(get_db)):
+    try:
+        location = validate_location(data.latitude, data.longitude)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    user.set_location(*location)
+    db.commit()
+    db.refresh(user)
+    for profile in (user.worker_profile, user.tutor_profile):
+        catalog_cache.invalidate_profile(profile)
     return UserResponse.model_validate(user)
 
 
@@ -112,8 +279,10 @@ def get_service_types():
 def create_worker_profile(
     service_type: str = Form(...),
     price: float = Form(...),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
     id_document: UploadFile = File(None),
-    user: User = Depends(require_role("worker")),
+    user: User = Depends(require_db_role("worker")),
     db: Session = Depends(get_db),
 ):
     if user.role != "worker":
@@ -125,6 +294,12 @@ def create_worker_profile(
         raise HTTPException(400, f"Invalid service type. Allowed: {HOME_SERVICE_TYPES}")
     if price is None or price < 0:
         raise HTTPException(400, "Price must be a positive number")
+    try:
+        location = validate_location(latitude, longitude)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if location:
+        user.set_location(*location)
     id_path = None
     if id_document and id_document.filename:
         ext = os.path.splitext(id_document.filename)[1] or ".bin"
@@ -136,6 +311,7 @@ def create_worker_profile(
         user_id=user.id,
         service_type=service_type,
         hourly_rate=round(float(price), 2),
+        geohash=user.geohash,
         id_document_path=id_path,
         verification_status="pending",
     )
@@ -158,6 +334,10 @@ def create_worker_profile(
         db.add(AIDecisionLog(user_id=user.id, decision_type="identity_verification", raw_response=str(e)))
         db.commit()
         db.refresh(profile)
+    refresh_rank_score(profile, user.trust_score)
+    db.commit()
+    catalog_cache.invalidate_profile(profile)
+    trust_queue.enqueue(user.id)  # the verification result feeds the trust score
     return WorkerProfileResponse.model_validate(profile)
 
 
@@ -177,9 +357,11 @@ def create_tutor_profile(
     qualification_text: str = Form(""),
     experience_description: str = Form(""),
     demo_transcript: str = Form(...),
+    latitude: Optional[float] = Form(None),
+    longitude: Optional[float] = Form(None),
     id_document: UploadFile = File(None),
     qualification_document: UploadFile = File(None),
-    user: User = Depends(require_role("tutor")),
+    user: User = Depends(require_db_role("tutor")),
     db: Session = Depends(get_db),
 ):
     if user.role != "tutor":
@@ -191,6 +373,12 @@ def create_tutor_profile(
         raise HTTPException(400, f"Invalid subject. Allowed: {TUTOR_SUBJECTS}")
     if price is None or price < 0:
         raise HTTPException(400, "Price must be a positive number")
+    try:
+        location = validate_location(latitude, longitude)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if location:
+        user.set_location(*location)
     id_path = None
     qual_path = None
     if id_document and id_document.filename:
@@ -209,6 +397,7 @@ def create_tutor_profile(
         user_id=user.id,
         subject=subject,
         hourly_rate=round(float(price), 2),
+        geohash=user.geohash,
         qualification_text=qualification_text or None,
         experience_description=experience_description or None,
         demo_transcript=demo_transcript,
@@ -242,6 +431,11 @@ def create_tutor_profile(
         db.add(AIDecisionLog(user_id=user.id, decision_type="tutor_evaluation", raw_response=str(e)))
         db.commit()
         db.refresh(profile)
+    index_tutor_profile(db, profile)
+    refresh_rank_score(profile, user.trust_score)
+    db.commit()
+    catalog_cache.invalidate_profile(profile)
+    trust_queue.enqueue(user.id)  # the verification result feeds the trust score
     return TutorProfileResponse.model_validate(profile)
 
 
@@ -253,44 +447,57 @@ def get_tutor_profile(user: User = Depends(require_role("tutor")), db: Session =
     return TutorProfileResponse.model_validate(profile)
 
 
+@app.get("/api/tutors/search", response_model=list[ProviderSearchResult])
+def search_tutors_text(
+    q: str,
+    subject: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Ranked free-text search over approved tutors' summary, qualifications and experience."""
+    if not fts_enabled():
+        raise HTTPException(501, "Full-text search requires SQLite FTS5")
+    if subject and subject not in TUTOR_SUBJECTS:
+        raise HTTPException(400, f"Invalid subject. Allowed: {TUTOR_SUBJECTS}")
+    return FastJSONResponse(search_tutors(db, q, subject=subject, limit=limit))
+
+
 # ---------- Provider Search (only approved) ----------
 @app.get("/api/providers/search", response_model=list[ProviderSearchResult])
 def search_providers(
     service_type: str = None,
     subject: str = None,
+    sort: str = "rank",
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    max_rating: Optional[float] = None,
+    free_from: Optional[datetime] = None,
+    free_to: Optional[datetime] = None,
     db: Session = Depends(get_db),
 ):
-    results = []
-    if service_type and service_type in HOME_SERVICE_TYPES:
-        workers = (
-            db.query(User, WorkerProfile)
-            .join(WorkerProfile, User.id == WorkerProfile.user_id)
-            .filter(WorkerProfile.service_type == service_type, WorkerProfile.verification_status == "approved")
-            .all()
-        )
-        for u, p in workers:
-            results.append(ProviderSearchResult(
-                id=u.id, name=u.name, email=u.email, role="worker",
-                trust_score=u.trust_score, service_type=p.service_type,
-                verification_status=p.verification_status, rating=p.rating,
-                price=p.hourly_rate,
-            ))
-    if subject and subject in TUTOR_SUBJECTS:
-        tutors = (
-            db.query(User, TutorProfile)
-            .join(TutorProfile, User.id == TutorProfile.user_id)
-            .filter(TutorProfile.subject == subject, TutorProfile.verification_status == "approved")
-            .all()
+    """
+    Approved providers, keyset-paginated. service_type and subject take comma-separated lists
+    (service_type=plumber,electrician). free_from/free_to keep only providers free for that whole window.
+    The next page's cursor is returned in the X-Next-Cursor header.
+    """
+    try:
+        location = validate_location(latitude, longitude)
+        free = validate_interval(free_from, free_to) or (None, None)
+        results, next_cursor = search_page(
+            db,
+            parse_multi(service_type, HOME_SERVICE_TYPES),
+            parse_multi(subject, TUTOR_SUBJECTS),
+            sort=sort, limit=limit, cursor=cursor, location=location,
+            filters=SearchFilters(min_price, max_price, min_rating, max_rating, *free),
         )
-        for u, p in tutors:
-            results.append(ProviderSearchResult(
-                id=u.id, name=u.name, email=u.email, role="tutor",
-                trust_score=u.trust_score, subject=p.subject,
-                verification_status=p.verification_status,
-                qualification_score=p.qualification_score, skill_score=p.skill_score,
-                profile_summary=p.profile_summary, price=p.hourly_rate,
-            ))
-    return results
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return FastJSONResponse(results, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 
 # ---------- Bookings ----------
@@ -300,56 +507,191 @@ def _booking_commission(total_price: float):
     return commission, provider_earning
 
 
-@app.post("/api/bookings", response_model=BookingResponse)
-def create_booking(
-    data: BookingCreate,
-    user: User = Depends(require_role("customer")),
-    db: Session = Depends(get_db),
-):
-    provider = db.query(User).filter(User.id == data.provider_id).first()
-    if not provider:
-        raise HTTPException(404, "Provider not found")
-    if provider.role == "worker":
-        profile = db.query(WorkerProfile).filter(WorkerProfile.user_id == provider.id).first()
-        if not profile or profile.verification_status != "approved":
-            raise HTTPException(400, "Provider is not approved")
+def _booking_target_error(profile, data: BookingCreate) -> Optional[str]:
+    """Why data cannot be booked with the provider owning profile (None if it can)."""
+    if not profile or profile.verification_status != "approved":
+        return "Provider is not approved"
+    if isinstance(profile, WorkerProfile):
         if profile.service_type != data.service_type:
-            raise HTTPException(400, "Service type mismatch")
+            return "Service type mismatch"
     else:
-        profile = db.query(TutorProfile).filter(TutorProfile.user_id == provider.id).first()
-        if not profile or profile.verification_status != "approved":
-            raise HTTPException(400, "Provider is not approved")
         subject_match = (data.subject and data.subject == profile.subject) or (
             data.service_type and data.service_type == profile.subject
         )
         if not subject_match:
-            raise HTTPException(400, "Subject mismatch")
+            return "Subject mismatch"
+    return None
+
+
+def _new_booking(
+    customer_id: int, data: BookingCreate, schedule: Optional[tuple[datetime, datetime]], accept_by: Optional[datetime],
+) -> Booking:
     commission, provider_earning = _booking_commission(data.total_price)
-    booking = Booking(
-        customer_id=user.id,
-        provider_id=provider.id,
+    return Booking(
+        customer_id=customer_id,
+        provider_id=data.provider_id,
         service_type=data.service_type,
         subject=data.subject,
         total_price=data.total_price,
         commission_amount=commission,
         provider_earning=provider_earning,
         status="pending",
+        scheduled_start=schedule[0] if schedule else None,
+        scheduled_end=schedule[1] if schedule else None,
+        accept_by=accept_by,
     )
+
+
+@app.post("/api/bookings", response_model=BookingResponse)
+def create_booking(
+    data: BookingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    user: User = Depends(require_role("customer")),
+    db: Session = Depends(get_db),
+):
+    """A retry with the same Idempotency-Key header gets the first response back (idempotency.py)."""
+    key = check_key(idempotency_key)
+    if key is None:
+        return _create_booking(data, user, db)
+    return idempotency_store.run(("bookings", user.id, key), fingerprint(data), lambda: _create_booking(data, user, db))
+
+
+def _create_booking(data: BookingCreate, user: User, db: Session) -> BookingResponse:
+    provider = db.query(User).filter(User.id == data.provider_id).first()
+    if not provider:
+        raise HTTPException(404, "Provider not found")
+    if provider.role == "worker":
+        profile = db.query(WorkerProfile).filter(WorkerProfile.user_id == provider.id).first()
+    else:
+        profile = db.query(TutorProfile).filter(TutorProfile.user_id == provider.id).first()
+    error = _booking_target_error(profile, data)
+    if error:
+        raise HTTPException(400, error)
+    try:
+        schedule = validate_interval(data.scheduled_start, data.scheduled_end, max_length=max_slot(), future=True)
+        accept_by = resolve_accept_by(data.accept_by, schedule[0] if schedule else None)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    booking = _new_booking(user.id, data, schedule, accept_by)
     db.add(booking)
+    db.flush()
+    if schedule and reserve(db, provider.id, *schedule, booking_id=booking.id) is None:
+        db.rollback()
+        raise HTTPException(409, "Provider is not available at that time")
+    bump_provider_stats(db, provider.id, **status_deltas(None, "pending"))
     db.commit()
     db.refresh(booking)
+    expiry_scheduler.schedule(booking.id, booking.accept_by)
+    trust_queue.enqueue(provider.id)
     return BookingResponse.model_validate(booking)
 
 
+@app.post("/api/bookings/batch", response_model=list[BookingBatchResult])
+def create_bookings_batch(
+    data: BookingBatchCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    user: User = Depends(require_role("customer")),
+    db: Session = Depends(get_db),
+):
+    """
+    Create up to MAX_BATCH_BOOKINGS bookings in one transaction. Providers and profiles are
+    loaded with one query each for the whole batch; items that fail validation or clash with
+    the provider's schedule are reported and skipped, the rest are created.
+    Returns one result per item, in request order. Honors Idempotency-Key like POST /api/bookings.
+    """
+    key = check_key(idempotency_key)
+    if key is None:
+        return _create_bookings_batch(data, user, db)
+    return idempotency_store.run(
+        ("bookings/batch", user.id, key), fingerprint(data), lambda: _create_bookings_batch(data, user, db),
+    )
+
+
+def _create_bookings_batch(data: BookingBatchCreate, user: User, db: Session) -> list[dict]:
+    if not data.items:
+        raise HTTPException(400, "No bookings given")
+    if len(data.items) > MAX_BATCH_BOOKINGS:
+        raise HTTPException(400, f"At most {MAX_BATCH_BOOKINGS} bookings per batch")
+    provider_ids = {item.provider_id for item in data.items}
+    roles = dict(db.query(User.id, User.role).filter(User.id.in_(provider_ids)).all())
+    worker_profiles = {p.user_id: p for p in db.query(WorkerProfile).filter(WorkerProfile.user_id.in_(provider_ids))}
+    tutor_profiles = {p.user_id: p for p in db.query(TutorProfile).filter(TutorProfile.user_id.in_(provider_ids))}
+
+    results: list[dict] = []
+    created: list[tuple[int, Booking]] = []
+    for index, item in enumerate(data.items):
+        role = roles.get(item.provider_id)
+        if role is None:
+            results.append({"index": index, "booking": None, "error": "Provider not found"})
+            continue
+        profiles = worker_profiles if role == "worker" else tutor_profiles
+        error = _booking_target_error(profiles.get(item.provider_id), item)
+        schedule = accept_by = None
+        if not error:
+            try:
+                schedule = validate_interval(item.scheduled_start, item.scheduled_end, max_length=max_slot(), future=True)
+                accept_by = resolve_accept_by(item.accept_by, schedule[0] if schedule else None)
+            except ValueError as e:
+                error = str(e)
+        if error:
+            results.append({"index": index, "booking": None, "error": error})
+            continue
+        booking = _new_booking(user.id, item, schedule, accept_by)
+        db.add(booking)
+        if schedule:
+            # Flushed one at a time so later items see the slots of earlier ones.
+            db.flush()
+            if reserve(db, item.provider_id, *schedule, booking_id=booking.id) is None:
+                db.delete(booking)
+                db.flush()
+                results.append({"index": index, "booking": None, "error": "Provider is not available at that time"})
+                continue
+        created.append((index, booking))
+        results.append(None)  # filled in after the commit
+    db.flush()
+    new_per_provider: dict[int, int] = {}
+    for _, booking in created:
+        new_per_provider[booking.provider_id] = new_per_provider.get(booking.provider_id, 0) + 1
+    for provider_id, count in new_per_provider.items():
+        bump_provider_stats(db, provider_id, total_bookings=count)
+    # Built from the flushed objects before the commit expires them (no reload per booking).
+    deadlines = []
+    for index, booking in created:
+        results[index] = {"index": index, "booking": BookingResponse.model_validate(booking), "error": None}
+        deadlines.append((booking.id, booking.accept_by))
+    db.commit()
+    for booking_id, accept_by in deadlines:
+        expiry_scheduler.schedule(booking_id, accept_by)
+    for provider_id in new_per_provider:
+        trust_queue.enqueue(provider_id)
+    return results
+
+
 @app.get("/api/bookings", response_model=list[BookingResponse])
 def list_bookings(
+    status: str = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
 ):
-    q = db.query(Booking).filter(
-        (Booking.customer_id == user.id) | (Booking.provider_id == user.id)
-    ).order_by(Booking.created_at.desc())
-    return [BookingResponse.model_validate(b) for b in q.all()]
+    """
+    The user's bookings as customer or provider, newest first and keyset-paginated.
+    status takes a comma-separated list; created_from/created_to bound created_at (to is exclusive).
+    The next page's cursor is returned in the X-Next-Cursor header.
+    """
+    try:
+        results, next_cursor = history_page(
+            db, user.id, limit=limit, cursor=cursor,
+            statuses=parse_multi(status, [s.value for s in BookingStatus], strict=True),
+            created_from=naive_utc(created_from) if created_from else None,
+            created_to=naive_utc(created_to) if created_to else None,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return FastJSONResponse(results, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 
 @app.patch("/api/bookings/{booking_id}", response_model=BookingResponse)
@@ -359,47 +701,144 @@ def update_booking_status(
     user: User = Depends(require_user),
     db: Session = Depends(get_db),
 ):
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if not booking:
-        raise HTTPException(404, "Booking not found")
-    if data.status not in ("accepted", "completed", "cancelled"):
-        raise HTTPException(400, "Invalid status")
-    if data.status == "accepted" and booking.provider_id != user.id:
-        raise HTTPException(403, "Only provider can accept")
-    if data.status in ("completed", "cancelled"):
-        if booking.customer_id != user.id and booking.provider_id != user.id:
-            raise HTTPException(403, "Only customer or provider can complete/cancel")
-    booking.status = data.status
-    db.commit()
-    db.refresh(booking)
+    try:
+        booking = transition(db, booking_id, user.id, data.status, data.version)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if booking is None:
+        db.rollback()
+        raise HTTPException(*transition_failure(db, booking_id, user.id, data.status, data.version))
+    # Counters only track completed/cancelled, so every allowed source state gives the same deltas.
+    old_status = TRANSITIONS[data.status][0]
+    bump_provider_stats(db, booking.provider_id, **status_deltas(old_status, data.status))
+    if data.status == "cancelled":
+        release_booking(db, booking.id)
     if data.status == "completed":
-        # Update trust scores
-        total = db.query(Booking).filter(Booking.provider_id == booking.provider_id).count()
-        completed = db.query(Booking).filter(
-            Booking.provider_id == booking.provider_id, Booking.status == "completed"
-        ).count()
-        cancelled = db.query(Booking).filter(
-            Booking.provider_id == booking.provider_id, Booking.status == "cancelled"
-        ).count()
-        completion_rate = completed / total if total else 0
-        cancellation_rate = cancelled / total if total else 0
-        avg_rating = db.query(func.avg(Rating.score)).filter(Rating.provider_id == booking.provider_id).scalar() or 0
-        provider_user = db.get(User, booking.provider_id)
-        wp = db.query(WorkerProfile).filter(WorkerProfile.user_id == booking.provider_id).first()
-        tp = db.query(TutorProfile).filter(TutorProfile.user_id == booking.provider_id).first()
-        ai_approved = (wp and wp.verification_status == "approved") or (tp and tp.verification_status == "approved")
-        provider_user.trust_score = compute_trust_score(ai_approved, completion_rate, cancellation_rate, avg_rating)
-        db.commit()
-    return BookingResponse.model_validate(booking)
+        record_completion(
+            db, booking.provider_id, booking_category(booking.service_type, booking.subject), booking.completed_at,
+            booking.total_price, booking.commission_amount, booking.provider_earning,
+        )
+    db.commit()
+    trust_queue.enqueue(booking.provider_id)
+    return FastJSONResponse(booking_dict(booking))
+
+
+# ---------- Availability ----------
+@app.post("/api/availability/time-off", response_model=list[BusySlotResponse])
+def add_time_off(
+    data: TimeOffCreate,
+    user: User = Depends(require_role("worker", "tutor")),
+    db: Session = Depends(get_db),
+):
+    try:
+        start, end = validate_interval(data.start_at, data.end_at, max_length=max_time_off())
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    slots = reserve(db, user.id, start, end)
+    if slots is None:
+        db.rollback()
+        raise HTTPException(409, "Time off overlaps a booking or existing time off")
+    db.commit()
+    return [BusySlotResponse.model_validate(slot) for slot in slots]
+
+
+@app.get("/api/availability/time-off", response_model=list[BusySlotResponse])
+def list_time_off(
+    user: User = Depends(require_role("worker", "tutor")),
+    db: Session = Depends(get_db),
+):
+    slots = db.query(ProviderBusySlot).filter(
+        ProviderBusySlot.provider_id == user.id,
+        ProviderBusySlot.booking_id.is_(None),
+        ProviderBusySlot.end_at > datetime.utcnow(),
+    ).order_by(ProviderBusySlot.start_at).all()
+    return [BusySlotResponse.model_validate(slot) for slot in slots]
+
+
+@app.delete("/api/availability/time-off/{slot_id}")
+def delete_time_off(
+    slot_id: int,
+    user: User = Depends(require_role("worker", "tutor")),
+    db: Session = Depends(get_db),
+):
+    """Remove the time off containing slot_id: every slot it was split into."""
+    slot = db.query(ProviderBusySlot).filter(
+        ProviderBusySlot.id == slot_id,
+        ProviderBusySlot.provider_id == user.id,
+        ProviderBusySlot.booking_id.is_(None),
+    ).first()
+    if slot is None:
+        raise HTTPException(404, "Time off not found")
+    group = ProviderBusySlot.id == slot.id if slot.group_id is None else ProviderBusySlot.group_id == slot.group_id
+    db.query(ProviderBusySlot).filter(group, ProviderBusySlot.provider_id == user.id).delete(synchronize_session=False)
+    db.commit()
+    return {"message": "Time off removed"}
+
+
+@app.get("/api/providers/{provider_id}/availability", response_model=AvailabilityResponse)
+def provider_availability(
+    provider_id: int,
+    start: datetime,
+    end: datetime,
+    db: Session = Depends(get_db),
+):
+    """Whether the provider has no booking or time off overlapping [start, end)."""
+    try:
+        start, end = validate_interval(start, end)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"provider_id": provider_id, "start": start, "end": end, "free": is_free(db, provider_id, start, end)}
+
+
+# ---------- Earnings ----------
+@app.get("/api/earnings", response_model=list[EarningsDay])
+def get_earnings(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user: User = Depends(require_role("worker", "tutor")),
+    db: Session = Depends(get_db),
+):
+    """The provider's completed-booking totals per UTC day and category; defaults to the last 30 days."""
+    try:
+        start, end = report_range(start, end)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return FastJSONResponse(provider_earnings(db, user.id, start, end))
+
+
+@app.get("/api/admin/revenue", response_model=list[EarningsDay])
+def get_platform_revenue(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    service_type: str = None,
+    user: User = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    """Platform gross, commission and provider payouts per UTC day and category (comma-separated filter)."""
+    try:
+        start, end = report_range(start, end)
+        categories = parse_multi(service_type, HOME_SERVICE_TYPES + TUTOR_SUBJECTS + ["tutor"], strict=True)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return FastJSONResponse(platform_revenue(db, start, end, categories))
 
 
 # ---------- Ratings ----------
 @app.post("/api/ratings")
 def create_rating(
     data: RatingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     user: User = Depends(require_role("customer")),
     db: Session = Depends(get_db),
 ):
+    """A retry with the same Idempotency-Key header gets the first response back (idempotency.py)."""
+    key = check_key(idempotency_key)
+    if key is None:
+        return _create_rating(data, user, db)
+    return idempotency_store.run(("ratings", user.id, key), fingerprint(data), lambda: _create_rating(data, user, db))
+
+
+def _create_rating(data: RatingCreate, user: User, db: Session) -> dict:
     if data.score < 1 or data.score > 5:
         raise HTTPException(400, "Score must be 1-5")
     rating = Rating(
@@ -410,16 +849,12 @@ def create_rating(
         comment=data.comment,
     )
     db.add(rating)
-    # Update provider average rating
-    avg = db.query(func.avg(Rating.score)).filter(Rating.provider_id == data.provider_id).scalar()
-    provider_user = db.get(User, data.provider_id)
-    wp = db.query(WorkerProfile).filter(WorkerProfile.user_id == data.provider_id).first()
-    tp = db.query(TutorProfile).filter(TutorProfile.user_id == data.provider_id).first()
-    if wp:
-        wp.rating = avg or 0
-    if tp:
-        pass  # tutors use same rating logic via User/trust_score
+    bump_provider_stats(db, data.provider_id, rating_sum=data.score, rating_count=1)
+    # Running average on the provider's profile; rank_score follows with the trust recompute.
+    categories = add_profile_rating(db, data.provider_id, data.score)
     db.commit()
+    catalog_cache.invalidate(*categories)
+    trust_queue.enqueue(data.provider_id)
     return {"message": "Rating submitted"}
 
 
@@ -1,8 +1,9 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Text, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Text, Index, Enum as SQLEnum
+from sqlalchemy.orm import relationship, deferred
 import enum
 from database import Base
+from geo import geohash_encode
 
 
 class UserRole(str, enum.Enum):
@@ -40,9 +41,14 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     email = Column(String(255), unique=True, nullable=False, index=True)
-    password_hash = Column(String(255), nullable=False)
+    password_hash = deferred(Column(String(255), nullable=False))  # loaded only for login
     role = Column(String(50), nullable=False)  # customer, worker, tutor
     trust_score = Column(Float, default=0.0)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True)  # copied to the profiles, which index it per category
+    token_version = Column(Integer, nullable=False, default=0)  # bumped to revoke all issued tokens
+    token_revoked_at = Column(DateTime, nullable=True)  # when token_version was last bumped
     created_at = Column(DateTime, default=datetime.utcnow)
 
     worker_profile = relationship("WorkerProfile", back_populates="user", uselist=False)
@@ -53,15 +59,44 @@ class User(Base):
     ratings_received = relationship("Rating", foreign_keys="Rating.provider_id", back_populates="provider")
     ai_decision_logs = relationship("AIDecisionLog", back_populates="user")
 
+    def set_location(self, latitude: float, longitude: float) -> None:
+        self.latitude = latitude
+        self.longitude = longitude
+        self.geohash = geohash_encode(latitude, longitude)
+        for profile in (self.worker_profile, self.tutor_profile):
+            if profile is not None:
+                profile.geohash = self.geohash
+
+    __table_args__ = (
+        Index("ix_users_token_revoked_at", "token_revoked_at"),
+    )
+
 
 class WorkerProfile(Base):
     __tablename__ = "worker_profiles"
+    __table_args__ = (
+        # Search filter + ORDER BY rating; user_id makes it covering for the join to users.
+        Index("ix_worker_profiles_service_status_rating", "service_type", "verification_status", "rating", "user_id"),
+        # Top-N recommendation by materialized rank_score.
+        Index("ix_worker_profiles_service_status_rank", "service_type", "verification_status", "rank_score", "user_id"),
+        # sort=price; unpriced (NULL) rows are their own range at the front of each category.
+        Index("ix_worker_profiles_service_status_price", "service_type", "verification_status", "hourly_rate", "user_id"),
+        # sort=trust on the owner's trust_score, copied onto the profile.
+        Index("ix_worker_profiles_service_status_trust", "service_type", "verification_status", "trust_score", "user_id"),
+        # Nearest-provider cell lookups: one range scan per geohash cell within the category.
+        Index("ix_worker_profiles_service_status_geohash", "service_type", "verification_status", "geohash"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
     service_type = Column(String(100), nullable=False)
     verification_status = Column(String(50), default="pending")
-    rating = Column(Float, default=0.0)
+    rating = Column(Float, nullable=False, default=0.0)  # rating_sum / rating_count, maintained with them on every rating
+    rating_sum = Column(Float, default=0.0)
+    rating_count = Column(Integer, default=0)
     hourly_rate = Column(Float, nullable=True)  # for chatbot recommendations
+    rank_score = Column(Float, default=0.0)  # ai_engine.compute_rank_score, kept current on every input change
+    trust_score = Column(Float, default=0.0)  # the user's trust_score, set with rank_score (refresh_rank_score)
+    geohash = Column(String(12), nullable=True)  # the user's geohash (User.set_location)
     id_document_path = Column(String(500), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -75,17 +110,36 @@ class WorkerProfile(Base):
 
 class TutorProfile(Base):
     __tablename__ = "tutor_profiles"
+    __table_args__ = (
+        # Search filter + ORDER BY rating; user_id makes it covering for the join to users.
+        Index("ix_tutor_profiles_subject_status_rating", "subject", "verification_status", "rating", "user_id"),
+        # Top-N recommendation by materialized rank_score.
+        Index("ix_tutor_profiles_subject_status_rank", "subject", "verification_status", "rank_score", "user_id"),
+        # sort=price; unpriced (NULL) rows are their own range at the front of each category.
+        Index("ix_tutor_profiles_subject_status_price", "subject", "verification_status", "hourly_rate", "user_id"),
+        # sort=trust on the owner's trust_score, copied onto the profile.
+        Index("ix_tutor_profiles_subject_status_trust", "subject", "verification_status", "trust_score", "user_id"),
+        # Nearest-provider cell lookups: one range scan per geohash cell within the category.
+        Index("ix_tutor_profiles_subject_status_geohash", "subject", "verification_status", "geohash"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
     subject = Column(String(100), nullable=False)
     qualification_score = Column(Float, nullable=True)
     skill_score = Column(Float, nullable=True)
+    rating = Column(Float, nullable=False, default=0.0)  # rating_sum / rating_count, maintained with them on every rating
+    rating_sum = Column(Float, default=0.0)
+    rating_count = Column(Integer, default=0)
     hourly_rate = Column(Float, nullable=True)  # for chatbot recommendations
+    rank_score = Column(Float, default=0.0)  # ai_engine.compute_rank_score, kept current on every input change
+    trust_score = Column(Float, default=0.0)  # the user's trust_score, set with rank_score (refresh_rank_score)
+    geohash = Column(String(12), nullable=True)  # the user's geohash (User.set_location)
     verification_status = Column(String(50), default="pending")
     profile_summary = Column(Text, nullable=True)
-    qualification_text = Column(Text, nullable=True)
-    experience_description = Column(Text, nullable=True)
-    demo_transcript = Column(Text, nullable=True)
+    # Large free text, loaded on access rather than with every profile row.
+    qualification_text = deferred(Column(Text, nullable=True))
+    experience_description = deferred(Column(Text, nullable=True))
+    demo_transcript = deferred(Column(Text, nullable=True))
     id_document_path = Column(String(500), nullable=True)
     qualification_document_path = Column(String(500), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -100,6 +154,13 @@ class TutorProfile(Base):
 
 class Booking(Base):
     __tablename__ = "bookings"
+    __table_args__ = (
+        Index("ix_bookings_provider_status", "provider_id", "status"),
+        Index("ix_bookings_customer_created", "customer_id", "created_at"),
+        Index("ix_bookings_provider_created", "provider_id", "created_at"),
+        # Pending bookings by acceptance deadline, for the expiry scheduler.
+        Index("ix_bookings_status_accept_by", "status", "accept_by"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     provider_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -109,6 +170,11 @@ class Booking(Base):
     commission_amount = Column(Float, nullable=False)
     provider_earning = Column(Float, nullable=False)
     status = Column(String(50), default="pending")
+    scheduled_start = Column(DateTime, nullable=True)  # UTC; unscheduled bookings block no time
+    scheduled_end = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    accept_by = Column(DateTime, nullable=True)  # still pending after this: cancelled (booking_expiry.py)
+    version = Column(Integer, nullable=False, default=1)  # bumped on every status change (booking_state.py)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -117,8 +183,54 @@ class Booking(Base):
     ratings = relationship("Rating", back_populates="booking", foreign_keys="Rating.booking_id")
 
 
+class ProviderBusySlot(Base):
+    """
+    A provider's busy interval [start_at, end_at): a scheduled booking (booking_id set) or time off.
+    No slot is longer than settings.max_busy_slot_hours, so overlap checks are bounded range
+    scans on (provider_id, start_at) (see availability.py).
+    """
+    __tablename__ = "provider_busy_slots"
+    __table_args__ = (
+        Index("ix_provider_busy_slots_provider_start", "provider_id", "start_at", "end_at"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    provider_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    start_at = Column(DateTime, nullable=False)
+    end_at = Column(DateTime, nullable=False)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=True, index=True)
+    group_id = Column(Integer, nullable=True, index=True)  # id of the first slot of one reservation
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ProviderEarningsDaily(Base):
+    """Completed bookings per provider, UTC day and category, maintained on completion (earnings.py)."""
+    __tablename__ = "provider_earnings_daily"
+    provider_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    service_type = Column(String(100), primary_key=True)  # home service type or tutor subject
+    completed_bookings = Column(Integer, nullable=False, default=0)
+    gross_amount = Column(Float, nullable=False, default=0.0)
+    commission_amount = Column(Float, nullable=False, default=0.0)
+    provider_earning = Column(Float, nullable=False, default=0.0)
+
+
+class PlatformRevenueDaily(Base):
+    """Completed bookings across all providers per UTC day and category (earnings.py)."""
+    __tablename__ = "platform_revenue_daily"
+    day = Column(Date, primary_key=True)
+    service_type = Column(String(100), primary_key=True)
+    completed_bookings = Column(Integer, nullable=False, default=0)
+    gross_amount = Column(Float, nullable=False, default=0.0)
+    commission_amount = Column(Float, nullable=False, default=0.0)
+    provider_earning = Column(Float, nullable=False, default=0.0)
+
+
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (
+        # Covering index for AVG(score) per provider.
+        Index("ix_ratings_provider_score", "provider_id", "score"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     provider_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -132,12 +244,24 @@ class Rating(Base):
     provider = relationship("User", foreign_keys=[provider_id], back_populates="ratings_received")
 
 
+class ProviderStats(Base):
+    """Per-provider booking and rating counters, maintained incrementally (see provider_stats.py)."""
+    __tablename__ = "provider_stats"
+    provider_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_bookings = Column(Integer, nullable=False, default=0)
+    completed_bookings = Column(Integer, nullable=False, default=0)
+    cancelled_bookings = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class AIDecisionLog(Base):
     __tablename__ = "ai_decision_logs"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     decision_type = Column(String(100), nullable=False)  # identity_verification, tutor_evaluation
-    raw_response = Column(Text, nullable=True)
+    raw_response = deferred(Column(Text, nullable=True))
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="ai_decision_logs")
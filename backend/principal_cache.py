@@ -0,0 +1,78 @@
+"""
+Cache of authenticated principals per bearer token (settings.auth_mode = "cached").
+A hit skips both the JWT verification and the user lookup; the first request with a token
+does both and stores a Principal snapshot. Entries are keyed by a hash of the token, expire
+after settings.principal_cache_ttl_seconds (or at the token's own expiry, if sooner) and are
+evicted least-recently-used beyond settings.principal_cache_max_entries. Changes to a user's
+role, trust score or token version in this process drop that user's entries; other
+processes see them within the TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from config import get_settings
+
+
+def _key(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class PrincipalCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[bytes, tuple[float, Any]] = OrderedDict()  # least recently used first
+        self._by_user: dict[int, set[bytes]] = {}
+
+    def get(self, token: str) -> Optional[Any]:
+        key = _key(token)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return hit[1]
+
+    def put(self, token: str, principal: Any, token_expires_at: Optional[float] = None) -> None:
+        """Store principal (anything with .id) for token; token_expires_at is the token's "exp" (epoch seconds)."""
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        key = _key(token)
+        with self._lock:
+            self._drop(key)
+            while len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._entries[key] = (expires_at, principal)
+            self._by_user.setdefault(principal.id, set()).add(key)
+
+    def _drop(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry[1].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry[1].id]
+
+    def invalidate_user(self, *user_ids: Optional[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                for key in list(self._by_user.get(user_id, ())):
+                    self._drop(key)
+
+
+_settings = get_settings()
+principal_cache = PrincipalCache(
+    ttl_seconds=_settings.principal_cache_ttl_seconds, max_entries=_settings.principal_cache_max_entries,
+)
@@ -0,0 +1,315 @@
+"""
+Provider search: approved-provider queries with keyset pagination.
+Workers and tutors across any number of categories are read in one UNION ALL statement,
+one branch per category.
+Results are ordered by (sort key, profile user_id) and the cursor carries the last
+(sort key, id) seen. Every sort key is a raw profile column (trust is the owner's score copied
+onto the profile), so each page is a range read of the profile's (category, status, key, user_id)
+index however deep the client scrolls.
+sort="distance" pages by (distance, id) through the geohash nearest-K lookup in geo.py.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Select, literal, null, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from availability import free_clause
+from catalog_cache import catalog_cache
+from geo import haversine_km, nearest, prefix_filter
+from models import User, WorkerProfile, TutorProfile
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PRICE_SENTINEL = 1e12  # unpriced providers sort last on price
+
+# sort -> (worker key expression, tutor key expression, descending)
+SORT_KEYS = {
+    # Raw columns (never NULL once backfilled) so each branch reads its index in order.
+    "rank": (WorkerProfile.rank_score, TutorProfile.rank_score, True),
+    # The owner's trust_score as copied onto each profile.
+    "trust": (WorkerProfile.trust_score, TutorProfile.trust_score, True),
+    "rating": (WorkerProfile.rating, TutorProfile.rating, True),
+    # NULL (unpriced) rows are read as a separate user_id-ordered range keyed PRICE_SENTINEL.
+    "price": (WorkerProfile.hourly_rate, TutorProfile.hourly_rate, False),
+}
+# Keyset tiebreak per branch: the trailing column of the profile indexes.
+ID_KEYS = (WorkerProfile.user_id, TutorProfile.user_id)
+# Per-branch geohash copy, indexed with the category filter for sort="distance".
+GEOHASH_KEYS = (WorkerProfile.geohash, TutorProfile.geohash)
+# Cursor sort tag inside the tail of a distance search: providers without a location, by rank.
+UNLOCATED_SORT = "distance-unlocated"
+
+
+def encode_cursor(sort: str, key: float, provider_id: int) -> str:
+    raw = json.dumps([sort, key, provider_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[float, int]:
+    """Return (key, id) from an opaque cursor. Raises ValueError if malformed or from another sort."""
+    cursor_sort, key, provider_id = _decode(cursor)
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match sort order")
+    return key, provider_id
+
+
+def _decode(cursor: str) -> tuple[str, float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, key, provider_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(cursor_sort), float(key), int(provider_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Range filters applied in SQL to every category of a search."""
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    # Only providers with no busy slot overlapping [free_from, free_to) (naive UTC).
+    free_from: Optional[datetime] = None
+    free_to: Optional[datetime] = None
+
+
+def _free(filters: SearchFilters) -> list:
+    if filters.free_from is None:
+        return []
+    return [free_clause(User.id, filters.free_from, filters.free_to)]
+
+
+def parse_multi(value: Optional[str], allowed: list[str], strict: bool = False) -> list[str]:
+    """
+    Split a comma-separated filter ("plumber,electrician") keeping known values, in order, once.
+    With strict, an unknown value raises ValueError instead of being skipped (where an empty
+    result would mean "no filter" rather than "nothing matches").
+    """
+    out = []
+    for part in (value or "").split(","):
+        part = part.strip().lower()
+        if part in allowed:
+            if part not in out:
+                out.append(part)
+        elif strict and part:
+            raise ValueError(f"Unknown value {part!r}. Allowed: {allowed}")
+    return out
+
+
+# Uniform column list of every branch of the search UNION ALL; only the columns a search
+# result needs, the Text columns on profiles are never read here.
+def _worker_columns():
+    return (
+        User.id.label("id"), User.name.label("name"), User.email.label("email"),
+        literal("worker").label("role"), WorkerProfile.trust_score.label("trust_score"),
+        WorkerProfile.service_type.label("service_type"), null().label("subject"),
+        WorkerProfile.verification_status.label("verification_status"), WorkerProfile.rating.label("rating"),
+        null().label("qualification_score"), null().label("skill_score"), null().label("profile_summary"),
+        WorkerProfile.hourly_rate.label("price"),
+        User.latitude.label("latitude"), User.longitude.label("longitude"),
+    )
+
+
+def _tutor_columns():
+    return (
+        User.id.label("id"), User.name.label("name"), User.email.label("email"),
+        literal("tutor").label("role"), TutorProfile.trust_score.label("trust_score"),
+        null().label("service_type"), TutorProfile.subject.label("subject"),
+        TutorProfile.verification_status.label("verification_status"), TutorProfile.rating.label("rating"),
+        TutorProfile.qualification_score.label("qualification_score"),
+        TutorProfile.skill_score.label("skill_score"),
+        TutorProfile.profile_summary.label("profile_summary"),
+        TutorProfile.hourly_rate.label("price"),
+        User.latitude.label("latitude"), User.longitude.label("longitude"),
+    )
+
+
+def _range(expr, lo: Optional[float], hi: Optional[float]) -> list:
+    clauses = []
+    if lo is not None:
+        clauses.append(expr >= lo)
+    if hi is not None:
+        clauses.append(expr <= hi)
+    return clauses
+
+
+def worker_branch(service_types: list[str], filters: SearchFilters = SearchFilters()) -> Select:
+    """Approved workers in service_types, as a select of the uniform search columns."""
+    return (
+        select(*_worker_columns())
+        .join(WorkerProfile, User.id == WorkerProfile.user_id)
+        .where(
+            WorkerProfile.service_type.in_(service_types),
+            WorkerProfile.verification_status == "approved",
+            *_range(WorkerProfile.hourly_rate, filters.min_price, filters.max_price),
+            *_range(SORT_KEYS["rating"][0], filters.min_rating, filters.max_rating),
+            *_free(filters),
+        )
+    )
+
+
+def tutor_branch(subjects: list[str], filters: SearchFilters = SearchFilters()) -> Select:
+    """Approved tutors in subjects, as a select of the uniform search columns."""
+    return (
+        select(*_tutor_columns())
+        .join(TutorProfile, User.id == TutorProfile.user_id)
+        .where(
+            TutorProfile.subject.in_(subjects),
+            TutorProfile.verification_status == "approved",
+            *_range(TutorProfile.hourly_rate, filters.min_price, filters.max_price),
+            *_range(SORT_KEYS["rating"][1], filters.min_rating, filters.max_rating),
+            *_free(filters),
+        )
+    )
+
+
+def provider_result(row) -> dict:
+    """A search row as a dict shaped like schemas.ProviderSearchResult, ready for FastJSONResponse."""
+    return {
+        "id": row.id, "name": row.name, "email": row.email, "role": row.role,
+        "trust_score": row.trust_score, "service_type": row.service_type, "subject": row.subject,
+        "verification_status": row.verification_status, "rating": row.rating,
+        "qualification_score": row.qualification_score, "skill_score": row.skill_score,
+        "profile_summary": row.profile_summary, "price": row.price, "distance": None,
+    }
+
+
+def _keyset(
+    branch: Select, key, id_key, descending: bool, after: Optional[tuple[float, int]], limit: int,
+) -> Select:
+    """Keyset-filter and order one branch on (key, id_key) and keep its first limit + 1 rows."""
+    branch = branch.add_columns(key.label("sort_key"))
+    if after is not None:
+        cmp = tuple_(key, id_key) < tuple_(*after) if descending else tuple_(key, id_key) > tuple_(*after)
+        branch = branch.where(cmp)
+    order = (key.desc(), id_key.desc()) if descending else (key.asc(), id_key.asc())
+    return branch.order_by(*order).limit(limit + 1)
+
+
+def _price_parts(branch: Select, kind: int, after: Optional[tuple[float, int]], limit: int) -> list[Select]:
+    """
+    Priced rows by (hourly_rate, user_id), then unpriced rows (hourly_rate IS NULL) by user_id under
+    PRICE_SENTINEL: two range reads of the price index instead of a sort on a coalesced key.
+    """
+    key, id_key = SORT_KEYS["price"][kind], ID_KEYS[kind]
+    parts = []
+    if after is None or after[0] < PRICE_SENTINEL:
+        parts.append(_keyset(branch.where(key.isnot(None)), key, id_key, False, after, limit))
+    unpriced = branch.where(key.is_(None)).add_columns(literal(PRICE_SENTINEL).label("sort_key"))
+    if after is not None and after[0] >= PRICE_SENTINEL:
+        unpriced = unpriced.where(id_key > after[1])
+    parts.append(unpriced.order_by(id_key.asc()).limit(limit + 1))
+    return parts
+
+
+def _union_page(
+    db: Session, branches: list[tuple[Select, int]], sort: str, after: Optional[tuple[float, int]], limit: int,
+) -> list:
+    """
+    One statement: each branch is cut to its own top limit + 1 (so each reads its index range),
+    then the UNION ALL is merged on (sort_key, id) and cut again.
+    """
+    descending = SORT_KEYS[sort][2]
+    parts = []
+    for branch, kind in branches:
+        if sort == "price":
+            parts.extend(_price_parts(branch, kind, after, limit))
+        else:
+            parts.append(_keyset(branch, SORT_KEYS[sort][kind], ID_KEYS[kind], descending, after, limit))
+    parts = [select(*part.subquery().c) for part in parts]
+    merged = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    order = (merged.c.sort_key.desc(), merged.c.id.desc()) if descending else (merged.c.sort_key.asc(), merged.c.id.asc())
+    return db.execute(select(merged).order_by(*order).limit(limit + 1)).all()
+
+
+def _nearest_page(
+    db: Session, branches: list[tuple[Select, int]], location: tuple[float, float],
+    after: Optional[tuple[float, int]], limit: int,
+) -> list:
+    """Nearest limit + 1 located rows of the branches to location, as (distance_km, row)."""
+    def load(cells):
+        parts = []
+        for branch, kind in branches:
+            geohash = GEOHASH_KEYS[kind]
+            branch = branch.where(geohash.isnot(None))
+            parts.append(branch if cells is None else branch.where(prefix_filter(geohash, cells)))
+        return db.execute(union_all(*parts) if len(parts) > 1 else parts[0]).all()
+
+    return nearest(load, location[0], location[1], limit + 1, after=after)
+
+
+def _unlocated_page(
+    db: Session, branches: list[tuple[Select, int]], after: Optional[tuple[float, int]], limit: int,
+) -> list:
+    """Providers without a location, best ranked first, as (rank_score, row): the tail of a distance search."""
+    unlocated = [(branch.where(GEOHASH_KEYS[kind].is_(None)), kind) for branch, kind in branches]
+    return [(row.sort_key, row) for row in _union_page(db, unlocated, "rank", after, limit)]
+
+
+def search_page(
+    db: Session,
+    service_types: list[str],
+    subjects: list[str],
+    sort: str = "rank",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    location: Optional[tuple[float, float]] = None,
+    filters: SearchFilters = SearchFilters(),
+) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of approved providers across any number of service types and tutor subjects,
+    fetched in a single UNION ALL query. With a customer location, results carry distance
+    and sort="distance" gives nearest first, followed by providers without a location by rank.
+    Returns (results, next_cursor); next_cursor is None on the last page.
+    """
+    if sort == "distance":
+        if location is None:
+            raise ValueError("sort=distance requires latitude and longitude")
+    elif sort not in SORT_KEYS:
+        raise ValueError(f"Invalid sort. Allowed: {list(SORT_KEYS) + ['distance']}")
+    in_tail = sort == "distance" and cursor is not None and _decode(cursor)[0] == UNLOCATED_SORT
+    after = decode_cursor(cursor, UNLOCATED_SORT if in_tail else sort) if cursor else None
+
+    # (select, index into SORT_KEYS entry), one per category: an IN over several categories
+    # would break the (category, status, key, user_id) index order and sort them all.
+    branches = [(worker_branch([c], filters), 0) for c in service_types]
+    branches += [(tutor_branch([c], filters), 1) for c in subjects]
+    if not branches:
+        return [], None
+
+    # (sort_key, row) in page order; rows from tail_from on are the unlocated tail of a distance search
+    tail_from = None
+    if sort == "distance":
+        rows = [] if in_tail else _nearest_page(db, branches, location, after, limit)
+        tail_from = len(rows)
+        if len(rows) <= limit:
+            rows += _unlocated_page(db, branches, after if in_tail else None, limit - len(rows))
+    elif filters.free_from is not None:
+        # Availability changes with every booking; not cached.
+        rows = [(row.sort_key, row) for row in _union_page(db, branches, sort, after, limit)]
+    else:
+        categories = tuple(service_types) + tuple(subjects)
+        variant = ("search", tuple(service_types), tuple(subjects), sort, limit, after, filters)
+        rows = catalog_cache.get_or_load(categories, variant, lambda: [
+            (row.sort_key, row) for row in _union_page(db, branches, sort, after, limit)
+        ])
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        tag = UNLOCATED_SORT if tail_from is not None and len(page) > tail_from else sort
+        next_cursor = encode_cursor(tag, page[-1][0], page[-1][1].id)
+    results = [provider_result(row) for _, row in page]
+    if location is not None and page:
+        located = [i for i, (_, row) in enumerate(page) if row.latitude is not None and row.longitude is not None]
+        distances = haversine_km(
+            location[0], location[1], [page[i][1].latitude for i in located], [page[i][1].longitude for i in located],
+        )
+        for i, d in zip(located, distances.tolist()):
+            results[i]["distance"] = round(d, 2)
+    return results, next_cursor
@@ -0,0 +1,207 @@
+"""
+Provider stats: per-provider counters behind the trust score.
+Counters are bumped with a single atomic upsert in the same transaction as the booking or
+rating write, so recomputing a trust score reads one row instead of aggregating history.
+rebuild_provider_stats() recreates every row from bookings and ratings.
+Profile ratings are a running average kept the same way: rating_sum and rating_count are
+incremented with the rating insert and rating is recomputed from them in the same UPDATE.
+
+Usage: python provider_stats.py rebuild
+"""
+import sys
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import bindparam, case, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ai_engine import compute_trust_score, refresh_rank_score
+from models import User, WorkerProfile, TutorProfile, Booking, Rating, ProviderStats
+
+COUNTERS = ("total_bookings", "completed_bookings", "cancelled_bookings", "rating_sum", "rating_count")
+
+
+def status_deltas(old_status: Optional[str], new_status: str) -> dict:
+    """Counter deltas for a booking moving from old_status (None for a new booking) to new_status."""
+    deltas = {}
+    if old_status is None:
+        deltas["total_bookings"] = 1
+    for status, counter in (("completed", "completed_bookings"), ("cancelled", "cancelled_bookings")):
+        change = (new_status == status) - (old_status == status)
+        if change:
+            deltas[counter] = change
+    return deltas
+
+
+def bump(db: Session, provider_id: int, **deltas) -> None:
+    """Atomically add deltas to a provider's counters, creating the row if missing."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    table = ProviderStats.__table__
+    stmt = insert(table).values(
+        provider_id=provider_id, updated_at=datetime.utcnow(),
+        **{c: deltas.get(c, 0) for c in COUNTERS},
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.provider_id],
+        set_={
+            **{c: table.c[c] + stmt.excluded[c] for c in deltas},
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def add_profile_rating(db: Session, provider_id: int, score: float) -> list[str]:
+    """
+    Fold one rating into the provider's profile running average with a single atomic UPDATE
+    per profile table. Returns the service types / subjects of the updated profiles.
+    """
+    categories = []
+    for model, category in ((WorkerProfile, WorkerProfile.service_type), (TutorProfile, TutorProfile.subject)):
+        rating_sum = func.coalesce(model.rating_sum, 0.0) + score
+        rating_count = func.coalesce(model.rating_count, 0) + 1
+        stmt = (
+            update(model)
+            .where(model.user_id == provider_id)
+            .values(rating_sum=rating_sum, rating_count=rating_count, rating=rating_sum / rating_count)
+            .returning(category)
+            .execution_options(synchronize_session=False)
+        )
+        categories.extend(db.execute(stmt).scalars().all())
+    return categories
+
+
+def rebuild_profile_ratings(db: Session, missing_only: bool = False) -> None:
+    """
+    Recompute profile rating_sum / rating_count / rating from the ratings table.
+    Profiles without ratings get zero counters and keep their current rating.
+    With missing_only, only profiles that predate the counters (rating_count NULL) are touched.
+    """
+    totals = [
+        {"pid": provider_id, "s": float(score_sum or 0.0), "n": count}
+        for provider_id, score_sum, count in db.query(
+            Rating.provider_id, func.sum(Rating.score), func.count(Rating.id),
+        ).group_by(Rating.provider_id)
+    ]
+    for model in (WorkerProfile, TutorProfile):
+        table = model.__table__
+        scope = [table.c.rating_count.is_(None)] if missing_only else []
+        if totals:
+            db.execute(
+                update(table)
+                .where(table.c.user_id == bindparam("pid"), *scope)
+                .values(rating_sum=bindparam("s"), rating_count=bindparam("n"), rating=bindparam("s") / bindparam("n")),
+                totals,
+            )
+        rated = [t["pid"] for t in totals]
+        db.execute(
+            update(table)
+            .where(table.c.user_id.notin_(rated), *scope)
+            .values(rating_sum=0.0, rating_count=0, rating=func.coalesce(table.c.rating, 0.0))
+        )
+    db.commit()
+
+
+def recompute_trust(db: Session, provider_id: int) -> tuple[Optional[User], list]:
+    """
+    Recompute a provider's trust score (and profile rank scores) from its counters.
+    Constant time: one stats row, the user and its profiles by primary/unique key.
+    Returns (provider user, [profiles]) so the caller can invalidate caches; does not commit.
+    """
+    provider_user = db.get(User, provider_id)
+    if provider_user is None:
+        return None, []
+    stats = db.get(ProviderStats, provider_id)
+    total = stats.total_bookings if stats else 0
+    completion_rate = stats.completed_bookings / total if total else 0
+    cancellation_rate = stats.cancelled_bookings / total if total else 0
+    avg_rating = stats.rating_sum / stats.rating_count if stats and stats.rating_count else 0
+    wp = db.query(WorkerProfile).filter(WorkerProfile.user_id == provider_id).first()
+    tp = db.query(TutorProfile).filter(TutorProfile.user_id == provider_id).first()
+    ai_approved = (wp and wp.verification_status == "approved") or (tp and tp.verification_status == "approved")
+    provider_user.trust_score = compute_trust_score(ai_approved, completion_rate, cancellation_rate, avg_rating)
+    profiles = [p for p in (wp, tp) if p]
+    for profile in profiles:
+        refresh_rank_score(profile, provider_user.trust_score)
+    return provider_user, profiles
+
+
+def rebuild_provider_stats(db: Session) -> int:
+    """Recreate all provider_stats rows from bookings and ratings. Returns the number of rows written."""
+    rows: dict[int, dict] = {}
+    booking_counts = db.query(
+        Booking.provider_id,
+        func.count(Booking.id),
+        func.sum(case((Booking.status == "completed", 1), else_=0)),
+        func.sum(case((Booking.status == "cancelled", 1), else_=0)),
+    ).group_by(Booking.provider_id)
+    for provider_id, total, completed, cancelled in booking_counts:
+        rows[provider_id] = {
+            "provider_id": provider_id, "total_bookings": total,
+            "completed_bookings": completed or 0, "cancelled_bookings": cancelled or 0,
+            "rating_sum": 0.0, "rating_count": 0,
+        }
+    rating_sums = db.query(Rating.provider_id, func.sum(Rating.score), func.count(Rating.id)).group_by(Rating.provider_id)
+    for provider_id, score_sum, count in rating_sums:
+        row = rows.setdefault(provider_id, {
+            "provider_id": provider_id, "total_bookings": 0,
+            "completed_bookings": 0, "cancelled_bookings": 0,
+        })
+        row["rating_sum"] = float(score_sum or 0.0)
+        row["rating_count"] = count
+    now = datetime.utcnow()
+    db.query(ProviderStats).delete()
+    if rows:
+        db.execute(ProviderStats.__table__.insert(), [{**r, "updated_at": now} for r in rows.values()])
+    db.commit()
+    return len(rows)
+
+
+def ensure_provider_stats(db: Session) -> None:
+    """Build provider_stats on first start against a database that already has bookings or ratings."""
+    if db.query(ProviderStats.provider_id).first() is not None:
+        return
+    if db.query(Booking.id).first() is None and db.query(Rating.id).first() is None:
+        return
+    rebuild_provider_stats(db)
+
+
+def ensure_profile_ratings(db: Session) -> None:
+    """
+    Backfill running-average counters for profiles created before they existed, and refresh
+    the rank_score of every backfilled profile: it was computed from the old rating (for
+    tutors, the evaluation-score stand-in) and is otherwise only refreshed on the next change.
+    """
+    stale = {
+        model: {profile_id for (profile_id,) in db.query(model.id).filter(model.rating_count.is_(None))}
+        for model in (WorkerProfile, TutorProfile)
+    }
+    if not any(stale.values()):
+        return
+    rebuild_profile_ratings(db, missing_only=True)
+    for model, profile_ids in stale.items():
+        if not profile_ids:
+            continue
+        for profile, trust_score in db.query(model, User.trust_score).join(User, User.id == model.user_id):
+            if profile.id in profile_ids:
+                refresh_rank_score(profile, trust_score)
+    db.commit()
+
+
+if __name__ == "__main__":
+    from database import Base, SessionLocal, engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("Usage: python provider_stats.py rebuild")
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt stats for {rebuild_provider_stats(session)} providers")
+        rebuild_profile_ratings(session)
+        print("Rebuilt profile ratings; run python trust_rebuild.py to refresh rank scores")
+    finally:
+        session.close()
@@ -0,0 +1,208 @@
+"""
+Sliding-window login throttling, checked before any DB lookup or bcrypt work.
+Attempts are counted per email and per client IP over one or more windows, configured as
+"count/seconds" lists (settings.login_limit_per_email, settings.login_limit_per_ip; e.g.
+"10/60,50/3600"). An attempt over any limit gets 429 with Retry-After and is recorded against
+none of its keys, so a client that keeps hammering does not extend its own lockout indefinitely
+and a throttled email does not use up its IP's allowance.
+The "memory" backend is per process; "redis" (settings.rate_limit_backend, needs the redis
+package) shares counts across workers.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from fastapi import HTTPException
+
+from config import get_settings
+
+MAX_TRACKED_KEYS = 100_000  # memory backend: least recently used keys are forgotten beyond this
+REDIS_TIMEOUT_SECONDS = 0.5
+
+logger = logging.getLogger(__name__)
+
+Limits = list[tuple[int, float]]  # (max attempts, window seconds)
+
+
+def parse_limits(spec: str) -> Limits:
+    """"10/60,50/3600" -> [(10, 60.0), (50, 3600.0)]. Empty disables. Raises ValueError if malformed."""
+    limits = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            count, seconds = part.split("/")
+            limit = (int(count), float(seconds))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit {part!r}, expected count/seconds")
+        if limit[0] < 1 or limit[1] <= 0:
+            raise ValueError(f"Invalid rate limit {part!r}")
+        limits.append(limit)
+    return limits
+
+
+class MemoryBackend:
+    """Per-key log of recent attempt times; never longer than the largest limit's count."""
+
+    def __init__(self, max_keys: int = MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._attempts: OrderedDict[str, deque] = OrderedDict()
+
+    def hit(self, checks: list[tuple[str, Limits]], now: float) -> Optional[float]:
+        """
+        Record an attempt against every key unless one of them exceeds a limit; then record
+        nothing and return seconds until the attempt would be allowed.
+        """
+        with self._lock:
+            logs = [self._log(key, limits, now) for key, limits in checks]
+            retry_after = 0.0
+            for attempts, (_, limits) in zip(logs, checks):
+                for count, window in limits:
+                    in_window = [t for t in attempts if t > now - window]
+                    if len(in_window) >= count:
+                        # Allowed again once the oldest attempt that still counts leaves the window.
+                        retry_after = max(retry_after, in_window[-count] + window - now)
+            if retry_after > 0:
+                return retry_after
+            for attempts in logs:
+                attempts.append(now)
+            return None
+
+    def _log(self, key: str, limits: Limits, now: float) -> deque:
+        """The key's attempt times still inside its longest window; call with the lock held."""
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            attempts = self._attempts[key] = deque()
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+        else:
+            self._attempts.move_to_end(key)
+        longest = max(window for _, window in limits)
+        while attempts and attempts[0] <= now - longest:
+            attempts.popleft()
+        return attempts
+
+    def clear(self) -> None:
+        with self._lock:
+            self._attempts.clear()
+
+
+# KEYS = one sorted set of attempt times per key; ARGV = now, member, then per key: its number
+# of limits, its longest window and its count/window pairs. Every key is checked before any is
+# recorded. Returns 0 (recorded) or milliseconds until allowed.
+_REDIS_HIT = """
+local now = tonumber(ARGV[1])
+local retry = 0
+local longest = {}
+local a = 3
+for k = 1, #KEYS do
+  local n = tonumber(ARGV[a])
+  longest[k] = tonumber(ARGV[a + 1])
+  a = a + 2
+  redis.call('ZREMRANGEBYSCORE', KEYS[k], '-inf', now - longest[k])
+  for i = 1, n do
+    local count, window = tonumber(ARGV[a]), tonumber(ARGV[a + 1])
+    a = a + 2
+    local recent = redis.call('ZRANGEBYSCORE', KEYS[k], '(' .. (now - window), '+inf', 'WITHSCORES')
+    local m = #recent / 2
+    if m >= count then
+      local oldest = tonumber(recent[(m - count) * 2 + 2])
+      retry = math.max(retry, oldest + window - now)
+    end
+  end
+end
+if retry > 0 then
+  return math.ceil(retry * 1000)
+end
+for k = 1, #KEYS do
+  redis.call('ZADD', KEYS[k], now, ARGV[2])
+  redis.call('PEXPIRE', KEYS[k], math.ceil(longest[k] * 1000))
+end
+return 0
+"""
+
+
+class RedisBackend:
+    """
+    Attempt logs as Redis sorted sets, checked and updated atomically by one Lua script.
+    Calls are bounded by REDIS_TIMEOUT_SECONDS; if Redis is unreachable the attempt is let
+    through (logged) rather than failing every login.
+    """
+
+    def __init__(self, url: str, prefix: str = "urbanplace:ratelimit:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("rate_limit_backend=redis requires the redis package (pip install redis)")
+        self.prefix = prefix
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=REDIS_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+        self._script = self._client.register_script(_REDIS_HIT)
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def hit(self, checks: list[tuple[str, Limits]], now: float) -> Optional[float]:
+        with self._lock:
+            self._counter += 1
+            member = f"{now:.6f}:{threading.get_ident()}:{self._counter}"
+        args = [now, member]
+        for _, limits in checks:
+            args += [len(limits), max(window for _, window in limits)]
+            for count, window in limits:
+                args += [count, window]
+        try:
+            retry_ms = int(self._script(keys=[self.prefix + key for key, _ in checks], args=args))
+        except self._errors:
+            logger.warning("Login rate limit check skipped: Redis unavailable", exc_info=True)
+            return None
+        return retry_ms / 1000.0 if retry_ms else None
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+class LoginRateLimiter:
+    def __init__(self, backend, email_limits: Limits, ip_limits: Limits):
+        self.backend = backend
+        self.email_limits = email_limits
+        self.ip_limits = ip_limits
+
+    def check(self, email: str, ip: Optional[str]) -> None:
+        """
+        Count a login attempt against the email and the IP, only if both are under their limits.
+        Raises HTTPException 429 otherwise. May block on the backend; call it off the event loop.
+        """
+        checks = []
+        if self.ip_limits and ip:
+            checks.append(("ip:" + ip, self.ip_limits))
+        if self.email_limits:
+            checks.append(("email:" + email.strip().lower(), self.email_limits))
+        if not checks:
+            return
+        retry_after = self.backend.hit(checks, time.time())
+        if retry_after is not None:
+            raise HTTPException(
+                429, "Too many login attempts, try again later",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+
+
+def _create_login_limiter() -> LoginRateLimiter:
+    settings = get_settings()
+    if settings.rate_limit_backend == "redis":
+        backend = RedisBackend(settings.redis_url)
+    else:
+        backend = MemoryBackend()
+    return LoginRateLimiter(
+        backend, parse_limits(settings.login_limit_per_email), parse_limits(settings.login_limit_per_ip),
+    )
+
+
+login_limiter = _create_login_limiter()
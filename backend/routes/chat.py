@@ -9,6 +9,7 @@ from typing import Optional, List
 
 from database import get_db
 from ai_chat_engine import chat_turn
+from geo import validate_location
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -21,6 +22,8 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     conversation_history: List[ChatMessage] = []
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 
 class RecommendedProvider(BaseModel):
@@ -30,7 +33,7 @@ class RecommendedProvider(BaseModel):
     rating: float
     trust_score: float
     price: float
-    distance: float
+    distance: Optional[float] = None  # km; None when the customer's location is unknown
 
 
 class ChatResponse(BaseModel):
@@ -60,7 +63,8 @@ def post_chat(
     try:
         history = _history_to_messages(body.conversation_history)
         is_urgent = _is_urgent(body.message, body.conversation_history)
-        result = chat_turn(db, body.message.strip(), history, is_urgent=is_urgent)
+        location = validate_location(body.latitude, body.longitude)
+        result = chat_turn(db, body.message.strip(), history, is_urgent=is_urgent, location=location)
         providers = result.get("recommended_providers")
         out = ChatResponse(
             reply=result.get("reply", "I'm here to help. Could you describe what you need?"),
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from pydantic import BaseModel
 
@@ -27,6 +27,8 @@ class UserResponse(BaseModel):
     email: str
     role: str
     trust_score: float
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     created_at: datetime
 
     class Config:
@@ -79,6 +81,9 @@ class BookingCreate(BaseModel):
     service_type: str
     subject: Optional[str] = None  # for tutor
     total_price: float
+    scheduled_start: Optional[datetime] = None  # both or neither; the provider must be free
+    scheduled_end: Optional[datetime] = None
+    accept_by: Optional[datetime] = None  # acceptance deadline (UTC); default BOOKING_ACCEPT_HOURS from now
 
 
 class BookingResponse(BaseModel):
@@ -89,14 +94,29 @@ class BookingResponse(BaseModel):
     subject: Optional[str] = None
     total_price: float
     status: str
+    scheduled_start: Optional[datetime] = None
+    scheduled_end: Optional[datetime] = None
+    accept_by: Optional[datetime] = None
+    version: int = 1
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class BookingBatchCreate(BaseModel):
+    items: List[BookingCreate]
+
+
+class BookingBatchResult(BaseModel):
+    index: int  # position in the request's items
+    booking: Optional[BookingResponse] = None
+    error: Optional[str] = None
+
+
 class BookingStatusUpdate(BaseModel):
     status: str  # accepted, completed, cancelled
+    version: Optional[int] = None  # the booking version last seen; 409 if it has changed since
 
 
 class RatingCreate(BaseModel):
@@ -120,6 +140,44 @@ class ProviderSearchResult(BaseModel):
     skill_score: Optional[float] = None
     profile_summary: Optional[str] = None
     price: Optional[float] = None
+    distance: Optional[float] = None  # km from the customer's location, when given
+
+
+class LocationUpdate(BaseModel):
+    latitude: float
+    longitude: float
+
+
+class TimeOffCreate(BaseModel):
+    start_at: datetime
+    end_at: datetime
+
+
+class BusySlotResponse(BaseModel):
+    id: int
+    start_at: datetime
+    end_at: datetime
+    booking_id: Optional[int] = None
+    group_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AvailabilityResponse(BaseModel):
+    provider_id: int
+    start: datetime
+    end: datetime
+    free: bool
+
+
+class EarningsDay(BaseModel):
+    day: date
+    service_type: str  # home service type or tutor subject
+    completed_bookings: int
+    gross_amount: float
+    commission_amount: float
+    provider_earning: float
 
 
 Token.model_rebuild()
@@ -9,6 +9,8 @@ from database import engine
 from config import get_settings
 from models import User, WorkerProfile, TutorProfile, HOME_SERVICE_TYPES, TUTOR_SUBJECTS
 from auth import get_password_hash
+from ai_engine import refresh_rank_score
+from tutor_search import index_tutor_profile
 
 
 def _ensure_hourly_rate(db: Session) -> None:
@@ -23,6 +25,13 @@ def _ensure_hourly_rate(db: Session) -> None:
             db.rollback()
 
 
+# Subject -> profile summary for seeded tutors (searchable via /api/tutors/search)
+TUTOR_SUMMARIES = {
+    "mathematics": "Algebra, calculus and JEE mathematics preparation for high school students.",
+    "coding": "Python and web development for beginners, including coding classes for kids.",
+    "language": "Spoken English and Hindi, grammar and conversation practice for all ages.",
+}
+
 # Service type -> count of workers to seed
 WORKER_SEED = [
     ("cleaning", 3),
@@ -53,6 +62,17 @@ def _random_price() -> float:
     return round(random.uniform(200.0, 1500.0), 0)
 
 
+# Seed providers are scattered around central Bengaluru.
+SEED_CENTER = (12.9716, 77.5946)
+
+
+def _random_location() -> tuple[float, float]:
+    return (
+        round(SEED_CENTER[0] + random.uniform(-0.1, 0.1), 6),
+        round(SEED_CENTER[1] + random.uniform(-0.1, 0.1), 6),
+    )
+
+
 def seed_providers(db: Session) -> int:
     """Create dummy users and profiles. Returns number of profiles created."""
     _ensure_hourly_rate(db)
@@ -86,6 +106,7 @@ def seed_providers(db: Session) -> int:
                 role="worker",
                 trust_score=_random_trust_score(),
             )
+            user.set_location(*_random_location())
             db.add(user)
             db.flush()
             profile = WorkerProfile(
@@ -94,7 +115,9 @@ def seed_providers(db: Session) -> int:
                 verification_status="approved",
                 rating=_random_rating(),
                 hourly_rate=_random_price(),
+                geohash=user.geohash,
             )
+            refresh_rank_score(profile, user.trust_score)
             db.add(profile)
             created += 1
 
@@ -116,6 +139,7 @@ def seed_providers(db: Session) -> int:
                 role="tutor",
                 trust_score=_random_trust_score(),
             )
+            user.set_location(*_random_location())
             db.add(user)
             db.flush()
             profile = TutorProfile(
@@ -124,9 +148,15 @@ def seed_providers(db: Session) -> int:
                 verification_status="approved",
                 qualification_score=random.randint(70, 95),
                 skill_score=random.randint(70, 95),
+                rating=_random_rating(),
                 hourly_rate=_random_price(),
+                geohash=user.geohash,
+                profile_summary=TUTOR_SUMMARIES.get(subject),
             )
+            refresh_rank_score(profile, user.trust_score)
             db.add(profile)
+            db.flush()
+            index_tutor_profile(db, profile)
             created += 1
 
     if created:
@@ -0,0 +1,29 @@
+"""
+Fast JSON responses for list endpoints.
+Handlers build plain dicts from projected rows and return FastJSONResponse directly, which
+skips FastAPI's per-item response_model validation; response_model stays on the route as
+the documented contract. Uses orjson when installed, stdlib json otherwise.
+"""
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
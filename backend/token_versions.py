@@ -0,0 +1,124 @@
+"""
+Token revocation for stateless auth (settings.auth_mode = "stateless").
+Every access token carries the user's token_version ("tv" claim); bumping users.token_version
+revokes all tokens issued before, and stamps users.token_revoked_at. Stateless requests don't
+load the user, so this process keeps a map of user id -> token_version for the users that
+revoked within the last token lifetime (older revocations only cover tokens that have expired).
+A background thread refreshes it every settings.token_version_refresh_seconds by reading only
+revocations newer than the last one seen, through the token_revoked_at index, so requests never
+touch the DB for it. A revocation made by another process takes effect here within that
+interval; one made here is applied immediately.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import SessionLocal
+from models import User
+
+# Re-read revocations this far behind the newest one seen: covers commits that land after a
+# later-stamped one, and clock skew between processes.
+REVOCATION_LOOKBACK = timedelta(minutes=5)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVersionMap:
+    def __init__(self, refresh_seconds: float, token_lifetime: timedelta, session_factory: Callable = SessionLocal):
+        self.refresh_seconds = refresh_seconds
+        self.token_lifetime = token_lifetime
+        self.session_factory = session_factory
+        self._versions: dict[int, tuple[int, datetime]] = {}  # user id -> (version, revoked at)
+        self._high_water: Optional[datetime] = None  # newest token_revoked_at read so far
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self, user_id: int) -> int:
+        """The user's token version; tokens with a lower "tv" claim are revoked."""
+        if self._thread is None and time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self.refresh()  # no refresher thread (scripts, tests): refresh on demand
+        entry = self._versions.get(user_id)
+        return entry[0] if entry else 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="token-versions", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Token version refresh failed")
+
+    def refresh(self) -> None:
+        """Fold in revocations since the last refresh and drop those older than a token lifetime."""
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is reloading; use the current map meanwhile
+        try:
+            horizon = datetime.utcnow() - self.token_lifetime
+            since = horizon if self._high_water is None else max(horizon, self._high_water - REVOCATION_LOOKBACK)
+            db = self.session_factory()
+            try:
+                rows = db.execute(
+                    select(User.id, User.token_version, User.token_revoked_at).where(User.token_revoked_at > since)
+                ).all()
+            finally:
+                db.close()
+            versions = {user_id: entry for user_id, entry in self._versions.items() if entry[1] > horizon}
+            for user_id, version, revoked_at in rows:
+                if version > versions.get(user_id, (0, None))[0]:
+                    versions[user_id] = (version, revoked_at)
+                if self._high_water is None or revoked_at > self._high_water:
+                    self._high_water = revoked_at
+            self._versions = versions
+            self._loaded_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def set(self, user_id: int, version: int) -> None:
+        """Record a revocation made by this process."""
+        with self._lock:
+            versions = dict(self._versions)
+            if version > versions.get(user_id, (0, None))[0]:
+                versions[user_id] = (version, datetime.utcnow())
+            self._versions = versions
+
+
+def ensure_revoked_at(db: Session) -> None:
+    """
+    Stamp revocations made before token_revoked_at existed, so they are loaded for one more token
+    lifetime. Runs once at startup; the token_version filter scans users (it has no index).
+    """
+    db.execute(
+        update(User)
+        .where(User.token_version > 0, User.token_revoked_at.is_(None))
+        .values(token_revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+_settings = get_settings()
+token_versions = TokenVersionMap(
+    refresh_seconds=_settings.token_version_refresh_seconds,
+    token_lifetime=timedelta(minutes=_settings.access_token_expire_minutes),
+)
@@ -0,0 +1,104 @@
+"""
+Bulk trust-score rebuild: recompute every provider's trust_score and rank_score at once
+(and the trust_score copy on its profiles).
+Run after changing compute_trust_score / compute_rank_score weights or thresholds.
+Aggregates are rebuilt with grouped queries (provider_stats), scores are computed with the
+vectorized ai_engine functions and written back with driver-level executemany UPDATEs.
+Runs as its own process: a server in auth_mode "cached" keeps serving the old trust_score in
+cached principals until their entries expire (settings.principal_cache_ttl_seconds).
+
+Usage: python trust_rebuild.py
+"""
+import time
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ai_engine import compute_trust_scores, compute_rank_scores
+from models import User, WorkerProfile, TutorProfile, ProviderStats
+from provider_stats import rebuild_provider_stats
+
+CHUNK_SIZE = 50_000
+
+
+def _executemany(db: Session, table: str, column: str, values: np.ndarray, ids: np.ndarray) -> None:
+    """UPDATE table SET column = value WHERE id = id for every pair, via the driver's executemany."""
+    mark = "?" if db.bind.dialect.paramstyle in ("qmark", "numeric") else "%s"
+    sql = f"UPDATE {table} SET {column} = {mark} WHERE id = {mark}"
+    conn = db.connection()
+    pairs = list(zip(values.tolist(), ids.tolist()))
+    for start in range(0, len(pairs), CHUNK_SIZE):
+        conn.exec_driver_sql(sql, pairs[start:start + CHUNK_SIZE])
+
+
+def rebuild_trust_scores(db: Session, rebuild_stats: bool = True) -> int:
+    """Recompute trust and rank scores for every worker and tutor. Returns the number of providers."""
+    if rebuild_stats:
+        rebuild_provider_stats(db)
+
+    # Core execution on the session's connection: plain tuples, no ORM row processing.
+    rows = db.connection().execute(
+        select(
+            User.id,
+            ProviderStats.total_bookings, ProviderStats.completed_bookings, ProviderStats.cancelled_bookings,
+            ProviderStats.rating_sum, ProviderStats.rating_count,
+            WorkerProfile.verification_status, TutorProfile.verification_status,
+        )
+        .outerjoin(ProviderStats, ProviderStats.provider_id == User.id)
+        .outerjoin(WorkerProfile, WorkerProfile.user_id == User.id)
+        .outerjoin(TutorProfile, TutorProfile.user_id == User.id)
+        .where(User.role.in_(("worker", "tutor")))
+    ).all()
+    if not rows:
+        return 0
+    ids, total, completed, cancelled, rating_sum, rating_count, wp_status, tp_status = zip(*rows)
+    ids = np.array(ids, dtype=np.int64)
+    total = np.array([t or 0 for t in total], dtype=np.float64)
+    completed = np.array([c or 0 for c in completed], dtype=np.float64)
+    cancelled = np.array([c or 0 for c in cancelled], dtype=np.float64)
+    rating_sum = np.array([r or 0.0 for r in rating_sum], dtype=np.float64)
+    rating_count = np.array([r or 0 for r in rating_count], dtype=np.float64)
+    approved = (np.array(wp_status, dtype=object) == "approved") | (np.array(tp_status, dtype=object) == "approved")
+
+    has_bookings = total > 0
+    safe_total = np.where(has_bookings, total, 1.0)
+    completion_rate = np.where(has_bookings, completed / safe_total, 0.0)
+    cancellation_rate = np.where(has_bookings, cancelled / safe_total, 0.0)
+    has_ratings = rating_count > 0
+    avg_rating = np.where(has_ratings, rating_sum / np.where(has_ratings, rating_count, 1.0), 0.0)
+    trust = compute_trust_scores(approved, completion_rate, cancellation_rate, avg_rating)
+    _executemany(db, User.__tablename__, "trust_score", trust, ids)
+
+    trust_by_id = dict(zip(ids.tolist(), trust.tolist()))
+    _rebuild_rank_scores(db, trust_by_id)
+    db.commit()
+    return len(ids)
+
+
+def _rebuild_rank_scores(db: Session, trust_by_id: dict[int, float]) -> None:
+    for model in (WorkerProfile, TutorProfile):
+        rows = db.connection().execute(select(model.id, model.user_id, model.hourly_rate, model.rating)).all()
+        if not rows:
+            continue
+        columns = list(zip(*rows))
+        profile_ids = np.array(columns[0], dtype=np.int64)
+        trust = np.array([trust_by_id.get(uid, 0.0) for uid in columns[1]], dtype=np.float64)
+        price = np.array([np.nan if p is None else p for p in columns[2]], dtype=np.float64)
+        rating = np.array([r or 0.0 for r in columns[3]], dtype=np.float64)
+        rank = compute_rank_scores(trust, rating, price)
+        _executemany(db, model.__tablename__, "rank_score", rank, profile_ids)
+        _executemany(db, model.__tablename__, "trust_score", trust, profile_ids)
+
+
+if __name__ == "__main__":
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = rebuild_trust_scores(session)
+        print(f"Rebuilt trust scores for {count} providers in {time.perf_counter() - started:.1f}s")
+    finally:
+        session.close()
@@ -0,0 +1,96 @@
+"""
+Background trust-score recompute queue.
+Request handlers only enqueue the provider id after their write commits; a single worker
+thread waits for a short debounce window, drains the set of pending providers and
+recomputes each one once, however many bookings or ratings arrived for it meanwhile.
+"""
+import logging
+import threading
+import time
+from typing import Callable
+
+from catalog_cache import catalog_cache
+from config import get_settings
+from database import SessionLocal
+from principal_cache import principal_cache
+from provider_stats import recompute_trust
+
+logger = logging.getLogger(__name__)
+
+
+class TrustRecomputeQueue:
+    def __init__(self, debounce_seconds: float, session_factory: Callable = SessionLocal):
+        self.debounce_seconds = debounce_seconds
+        self.session_factory = session_factory
+        self._pending: set[int] = set()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def enqueue(self, provider_id: int) -> None:
+        with self._cond:
+            wake = not self._pending
+            self._pending.add(provider_id)
+            if wake:  # only the first event of a batch starts its debounce window
+                self._cond.notify()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="trust-recompute", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the worker after recomputing everything still pending."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def flush(self) -> int:
+        """Recompute all pending providers now, in the calling thread. Returns how many were recomputed."""
+        with self._cond:
+            batch, self._pending = self._pending, set()
+        if batch:
+            self._recompute(batch)
+        return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                # Debounce: let more events for the same providers coalesce into this batch,
+                # until a fixed deadline (later enqueues must not restart or cut the window).
+                deadline = time.monotonic() + self.debounce_seconds
+                while not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+    def _recompute(self, provider_ids: set[int]) -> None:
+        db = self.session_factory()
+        try:
+            profiles = []
+            for provider_id in sorted(provider_ids):
+                try:
+                    profiles += recompute_trust(db, provider_id)[1]
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    logger.exception("Trust recompute failed for provider %s", provider_id)
+            catalog_cache.invalidate_profile(*profiles)
+            principal_cache.invalidate_user(*provider_ids)
+        finally:
+            db.close()
+
+
+trust_queue = TrustRecomputeQueue(debounce_seconds=get_settings().trust_recompute_debounce_seconds)
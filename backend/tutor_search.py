@@ -0,0 +1,105 @@
+"""
+Full-text search over tutor profiles using an SQLite FTS5 index.
+The index mirrors profile_summary, qualification_text and experience_description,
+keyed by tutor_profiles.id, and is refreshed whenever a tutor profile is created or evaluated.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from database import engine
+from models import TutorProfile, User, TUTOR_SUBJECTS
+from provider_search import provider_result, tutor_branch
+
+FTS_TABLE = "tutor_profiles_fts"
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_enabled() -> bool:
+    return "sqlite" in get_settings().database_url
+
+
+def ensure_fts_index() -> None:
+    """Create the FTS5 table if missing and backfill it from tutor_profiles when first created."""
+    if not fts_enabled():
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        if exists:
+            return
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "profile_summary, qualification_text, experience_description, tokenize = 'unicode61')"
+        ))
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, profile_summary, qualification_text, experience_description) "
+            "SELECT id, COALESCE(profile_summary, ''), COALESCE(qualification_text, ''), "
+            "COALESCE(experience_description, '') FROM tutor_profiles"
+        ))
+
+
+def index_tutor_profile(db: Session, profile: TutorProfile) -> None:
+    """Replace the profile's row in the FTS index. Runs in the caller's transaction."""
+    if not fts_enabled():
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": profile.id})
+    db.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE} (rowid, profile_summary, qualification_text, experience_description) "
+            "VALUES (:id, :summary, :qualification, :experience)"
+        ),
+        {
+            "id": profile.id,
+            "summary": profile.profile_summary or "",
+            "qualification": profile.qualification_text or "",
+            "experience": profile.experience_description or "",
+        },
+    )
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match, the last one
+    as a prefix ("JEE phys" finds "JEE physics"). Words are quoted so user input can't
+    inject FTS5 operators. Returns None if q has no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(q or "")
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_tutors(db: Session, q: str, subject: Optional[str] = None, limit: int = 20) -> list[dict]:
+    """Approved tutors matching q, best match first, as ProviderSearchResult-shaped dicts."""
+    ids = search_tutor_ids(db, q, subject=subject, limit=limit)
+    if not ids:
+        return []
+    rows = db.execute(tutor_branch([subject] if subject else TUTOR_SUBJECTS).where(User.id.in_(ids))).all()
+    by_id = {row.id: provider_result(row) for row in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def search_tutor_ids(db: Session, q: str, subject: Optional[str] = None, limit: int = 20) -> list[int]:
+    """Approved tutor user ids matching q, best bm25 match first."""
+    match = build_match_query(q)
+    if match is None:
+        return []
+    sql = (
+        f"SELECT tp.user_id FROM {FTS_TABLE} "
+        f"JOIN tutor_profiles tp ON tp.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match AND tp.verification_status = 'approved'"
+    )
+    params = {"match": match, "limit": limit}
+    if subject:
+        sql += " AND tp.subject = :subject"
+        params["subject"] = subject
+    # Summary hits weigh most, then qualifications, then experience.
+    sql += f" ORDER BY bm25({FTS_TABLE}, 3.0, 2.0, 1.0) LIMIT :limit"
+    return [row[0] for row in db.execute(text(sql), params)]
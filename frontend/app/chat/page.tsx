@@ -133,7 +133,7 @@ export default function ChatPage() {
                     <span>★ {p.rating}</span>
                     <span>Trust {p.trust_score}</span>
                     <span>₹{p.price}</span>
-                    <span>{p.distance} km</span>
+                    {p.distance != null && <span>{p.distance} km</span>}
                   </div>
                 </div>
               ))}
@@ -4,7 +4,7 @@ import { useEffect, useState } from "react";
 import Link from "next/link";
 import { useRouter } from "next/navigation";
 import { useAuth } from "@/lib/auth";
-import { workers, tutors, bookings } from "@/lib/api";
+import { workers, tutors, bookings, nextCursor } from "@/lib/api";
 import type { Booking, WorkerProfile, TutorProfile } from "@/lib/api";
 
 export default function DashboardPage() {
@@ -13,6 +13,8 @@ export default function DashboardPage() {
   const [workerProfile, setWorkerProfile] = useState<WorkerProfile | null>(null);
   const [tutorProfile, setTutorProfile] = useState<TutorProfile | null>(null);
   const [bookingsList, setBookingsList] = useState<Booking[]>([]);
+  const [bookingsCursor, setBookingsCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [menuOpen, setMenuOpen] = useState(false);
 
@@ -26,6 +28,7 @@ export default function DashboardPage() {
       try {
         const bookingsRes = await bookings.list();
         setBookingsList(bookingsRes.data);
+        setBookingsCursor(nextCursor(bookingsRes));
         if (user.role === "worker") {
           workers.getProfile().then((r) => setWorkerProfile(r.data)).catch(() => {});
         }
@@ -44,13 +47,28 @@ export default function DashboardPage() {
   const updateBookingStatus = async (bookingId: number, status: string) => {
     try {
       await bookings.updateStatus(bookingId, status);
-      const { data } = await bookings.list();
-      setBookingsList(data);
+      const res = await bookings.list();
+      setBookingsList(res.data);
+      setBookingsCursor(nextCursor(res));
     } catch (e) {
       console.error(e);
     }
   };
 
+  const loadMoreBookings = async () => {
+    if (!bookingsCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await bookings.list({ cursor: bookingsCursor });
+      setBookingsList((prev) => [...prev, ...res.data]);
+      setBookingsCursor(nextCursor(res));
+    } catch (e) {
+      console.error(e);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const logout = () => {
     localStorage.removeItem("token");
     localStorage.removeItem("user");
@@ -229,6 +247,18 @@ export default function DashboardPage() {
             ))}
           </ul>
         )}
+        {bookingsCursor && (
+          <div className="mt-6 flex justify-center">
+            <button
+              type="button"
+              onClick={loadMoreBookings}
+              disabled={loadingMore}
+              className="btn-secondary py-2 text-sm"
+            >
+              {loadingMore ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </main>
     </div>
   );
@@ -1,4 +1,5 @@
 import axios from "axios";
+import type { AxiosResponse } from "axios";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -27,6 +28,10 @@ api.interceptors.response.use(
   }
 );
 
+/** Cursor of the next page of a keyset-paginated list, from its X-Next-Cursor header (null on the last page). */
+export const nextCursor = (res: AxiosResponse): string | null =>
+  (res.headers["x-next-cursor"] as string | undefined) ?? null;
+
 export type UserRole = "customer" | "worker" | "tutor";
 
 export interface User {
@@ -57,6 +62,8 @@ export interface ProviderSearchResult {
   qualification_score?: number;
   skill_score?: number;
   profile_summary?: string;
+  price?: number;
+  distance?: number;
 }
 
 export interface Booking {
@@ -67,6 +74,10 @@ export interface Booking {
   subject?: string;
   total_price: number;
   status: string;
+  scheduled_start?: string | null;
+  scheduled_end?: string | null;
+  accept_by?: string | null;
+  version: number;
   created_at: string;
 }
 
@@ -98,6 +109,7 @@ export const auth = {
   login: (email: string, password: string) =>
     api.post<TokenResponse>("/api/auth/login", { email, password }),
   me: () => api.get<User>("/api/auth/me"),
+  logoutAll: () => api.post<{ message: string }>("/api/auth/logout-all"),
 };
 
 export const constants = {
@@ -143,16 +155,49 @@ export const tutors = {
 };
 
 export const providers = {
-  search: (params: { service_type?: string; subject?: string }) =>
+  search: (params: {
+    service_type?: string;
+    subject?: string;
+    sort?: "trust" | "rating" | "price" | "distance";
+    limit?: number;
+    cursor?: string;
+    latitude?: number;
+    longitude?: number;
+    free_from?: string;
+    free_to?: string;
+  }) =>
     api.get<ProviderSearchResult[]>("/api/providers/search", { params }),
 };
 
 export const bookings = {
-  list: () => api.get<Booking[]>("/api/bookings"),
-  create: (provider_id: number, service_type: string, total_price: number, subject?: string) =>
-    api.post<Booking>("/api/bookings", { provider_id, service_type, total_price, subject }),
-  updateStatus: (bookingId: number, status: string) =>
-    api.patch<Booking>(`/api/bookings/${bookingId}`, { status }),
+  list: (params?: {
+    status?: string;
+    created_from?: string;
+    created_to?: string;
+    limit?: number;
+    cursor?: string;
+  }) => api.get<Booking[]>("/api/bookings", { params }),
+  create: (
+    provider_id: number,
+    service_type: string,
+    total_price: number,
+    subject?: string,
+    schedule?: { scheduled_start: string; scheduled_end: string }
+  ) =>
+    api.post<Booking>("/api/bookings", { provider_id, service_type, total_price, subject, ...schedule }),
+  createBatch: (
+    items: {
+      provider_id: number;
+      service_type: string;
+      total_price: number;
+      subject?: string;
+      scheduled_start?: string;
+      scheduled_end?: string;
+    }[]
+  ) =>
+    api.post<{ index: number; booking: Booking | null; error: string | null }[]>("/api/bookings/batch", { items }),
+  updateStatus: (bookingId: number, status: string, version?: number) =>
+    api.patch<Booking>(`/api/bookings/${bookingId}`, { status, version }),
 };
 
 export const ratings = {
@@ -173,7 +218,7 @@ export interface RecommendedProvider {
   rating: number;
   trust_score: number;
   price: number;
-  distance: number;
+  distance: number | null;
 }
 
 export interface ChatResponse {
@@ -182,6 +227,6 @@ export interface ChatResponse {
 }
 
 export const chat = {
-  send: (message: string, conversation_history: ChatMessage[]) =>
-    api.post<ChatResponse>("/api/chat", { message, conversation_history }),
+  send: (message: string, conversation_history: ChatMessage[], location?: { latitude: number; longitude: number }) =>
+    api.post<ChatResponse>("/api/chat", { message, conversation_history, ...location }),
 };